@@ -48,7 +48,10 @@ class UserDataDoc(Document):
 
     class Settings:
         name = "user_data"
-        indexes = ["username", "email", "teacher_code", "teacher_id"]
+        indexes = [
+            "username", "email", "teacher_code", "teacher_id",
+            [("email", 1), ("role", 1)],  # teacher lookups by email
+        ]
 
 
 class VocabItem(BaseModel):
@@ -71,6 +74,9 @@ class SceneDoc(Document):
     
     class Settings:
         name = "scenes"
+        indexes = [
+            [("teacher_id", 1), ("_id", 1)],  # a teacher's scenes, and ownership-checked lookups
+        ]
 
 
 class AssignmentDoc(Document):
@@ -123,4 +129,9 @@ class PerformanceMetricDoc(Document):
 
     class Settings:
         name = "performance_metrics"
-        indexes = ["session_id", "username", "operation_type", "timestamp"]
\ No newline at end of file
+        indexes = [
+            "session_id",
+            "username",
+            "timestamp",  # date-range exports
+            [("operation_type", 1), ("timestamp", -1)],  # one operation type over time; also covers operation_type alone
+        ]
\ No newline at end of file
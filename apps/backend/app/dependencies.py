@@ -1,4 +1,7 @@
+import time
+from beanie import PydanticObjectId
 from fastapi import HTTPException
+from pydantic import BaseModel, Field
 from app.db.models import UserDataDoc
 
 async def get_current_teacher(email: str) -> UserDataDoc:
@@ -10,3 +13,53 @@ async def get_current_teacher(email: str) -> UserDataDoc:
     if not user or user.role != "teacher":
         raise HTTPException(status_code=403, detail="Access denied: Teachers only")
     return user
+
+
+class _TeacherIdView(BaseModel):
+    """Projection of a teacher's UserDataDoc down to its id."""
+    id: PydanticObjectId = Field(alias="_id")
+
+
+# Teacher ids by email, with the time they expire. Teacher records rarely change,
+# so endpoints that only need the id skip the Mongo lookup for a short while.
+_TEACHER_ID_TTL_SECONDS = 60
+_TEACHER_ID_CACHE_MAX = 1024
+_teacher_id_cache: dict[str, tuple[str, float]] = {}
+
+
+def _remember_teacher(email: str, teacher_id: str, now: float) -> None:
+    _teacher_id_cache.pop(email, None)
+    if len(_teacher_id_cache) >= _TEACHER_ID_CACHE_MAX:
+        # Drop expired entries first, then the oldest ones if it is still full
+        for key in [k for k, (_, expires) in _teacher_id_cache.items() if expires <= now]:
+            del _teacher_id_cache[key]
+        while len(_teacher_id_cache) >= _TEACHER_ID_CACHE_MAX:
+            del _teacher_id_cache[next(iter(_teacher_id_cache))]
+    _teacher_id_cache[email] = (teacher_id, now + _TEACHER_ID_TTL_SECONDS)
+
+
+async def get_current_teacher_id(email: str) -> str:
+    """
+    Like get_current_teacher, but returns only the teacher's id (as a string).
+    Fetches just the _id and caches it briefly per email.
+    """
+    now = time.monotonic()
+    cached = _teacher_id_cache.get(email)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    teacher = await UserDataDoc.find_one(
+        UserDataDoc.email == email, UserDataDoc.role == "teacher"
+    ).project(_TeacherIdView)
+    if not teacher:
+        _teacher_id_cache.pop(email, None)
+        raise HTTPException(status_code=403, detail="Access denied: Teachers only")
+
+    teacher_id = str(teacher.id)
+    _remember_teacher(email, teacher_id, now)
+    return teacher_id
+
+
+def forget_teacher(email: str) -> None:
+    """Drop a cached teacher id, e.g. after the user's role changes."""
+    _teacher_id_cache.pop(email, None)
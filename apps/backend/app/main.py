@@ -2,6 +2,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.db.init import init_db
+from app.utils.performance import flush_metrics
+from app.routers.lesson_graph import drain_background_writes
 from app.routers import audio, base, auth, assignments, scenes, eval_chat
 
 app = FastAPI(title="AI Glasses Backend", version="0.1.0")
@@ -18,6 +20,12 @@ app.add_middleware(
 async def on_startup():
     await init_db()
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Write out any dialogue entries, lesson saves and performance metrics still queued
+    await drain_background_writes()
+    await flush_metrics()
+
 @app.get("/health")
 async def health():
     return {"status": "ok", "env": settings.env}
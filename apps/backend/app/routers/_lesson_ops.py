@@ -0,0 +1,623 @@
+"""Lesson operations shared by the lesson graph and the streaming router.
+
+Kept free of imports from `app.routers.base` and `app.routers.lesson_graph`
+so both can import from here at module scope.
+"""
+from __future__ import annotations
+import base64
+import logging
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, Optional
+
+from fastapi import HTTPException
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.prompts.chat_prompts import prompt_next_object, evaluate_response_prompt, generate_hint_prompt, give_answer_with_memory_aid_prompt, detect_intent_prompt
+from app.schemas.plan import Plan, Object
+from app.schemas.evaluation import EvaluationResult
+from app.utils.performance import track_performance
+
+if TYPE_CHECKING:
+    from app.routers.base import SessionState
+
+
+# Grammatical persons for grammar mode
+GRAMMAR_PERSONS = [
+    "first_singular",   # I / yo
+    "second_singular",  # you (informal) / tú
+    "third_singular",   # he/she/it / él/ella/usted
+    "first_plural",     # we / nosotros
+    "second_plural",    # you all / vosotros/ustedes
+    "third_plural",     # they / ellos/ellas/ustedes
+]
+
+# Human-readable labels for grammar persons
+GRAMMAR_PERSON_LABELS = {
+    "first_singular": "first person singular (I/yo)",
+    "second_singular": "second person singular (you/tú)",
+    "third_singular": "third person singular (he/she/él/ella)",
+    "first_plural": "first person plural (we/nosotros)",
+    "second_plural": "second person plural (you all/vosotros)",
+    "third_plural": "third person plural (they/ellos)",
+}
+
+
+def get_next_object_index(plan: Plan, completed_objects: dict[int, bool | None]) -> int:
+    """Get the next untested object index."""
+    for i in range(len(plan.objects)):
+        if i not in completed_objects:
+            return i
+    return -1  # all objects tested
+
+
+async def generate_prompt_message(
+    object: Object, 
+    target_language: str, 
+    source_language: str,
+    attempt_number: int = 1,
+    max_attempts: int = 3,
+    grammar_mode: str = "vocab",
+    grammar_tense: str = "none",
+    grammar_person: Optional[str] = None,
+    state: Optional[SessionState] = None
+) -> str:
+    """Generate a prompt message asking user to interact with an object.
+    
+    Args:
+        object: The object to prompt for
+        target_language: Target language for learning
+        source_language: Source language (native language)
+        attempt_number: Current attempt number (1-based)
+        max_attempts: Maximum attempts allowed (default 3)
+        grammar_mode: Practice mode ("vocab" or "grammar")
+        grammar_tense: Grammar tense ("present indicative" or "preterite")
+        grammar_person: Grammatical person for grammar mode (e.g., "first_singular")
+        state: Optional session state for tracking
+    """
+    session_id = state.session_id if state else None
+    username = state.username if state else None
+    is_retry = attempt_number > 1
+    
+    # Get human-readable label for grammar person
+    grammar_person_label = GRAMMAR_PERSON_LABELS.get(grammar_person, grammar_person) if grammar_person else "none"
+    
+    async with track_performance(
+        operation_type="prompt_generation",
+        operation_name="generate_prompt_message",
+        session_id=session_id,
+        username=username,
+        metadata={
+            "model": settings.llm_model, 
+            "target_language": target_language, 
+            "attempt_number": attempt_number,
+            "max_attempts": max_attempts,
+            "grammar_mode": grammar_mode,
+            "grammar_tense": grammar_tense,
+            "grammar_person": grammar_person,
+        }
+    ):
+        prompt_value = prompt_next_object.invoke({
+            "source_name": object.source_name,
+            "target_word": object.target_name,
+            "target_language": target_language,
+            "action": object.action,
+            "source_language": source_language,
+            "attempt_number": attempt_number,
+            "max_attempts": max_attempts,
+            "is_retry": is_retry,
+            "grammar_mode": grammar_mode,
+            "grammar_tense": grammar_tense,
+            "grammar_person": grammar_person_label,
+        })
+        llm = ChatOpenAI(model=settings.llm_model, api_key=settings.openai_api_key)
+        messages = prompt_value.to_messages()
+        # Async so a prompt prefetched in the background doesn't hold the event loop
+        response = await llm.ainvoke(messages)
+        return response.content if hasattr(response, 'content') else str(response)
+
+
+def generate_summary(
+    plan: Plan, 
+    completed_objects: dict[int, bool | None], 
+    dialogue_entries: Iterable[dict], 
+    item_attempts: dict[int, int] = None,
+    item_hints_used: dict[int, int] = None,
+    item_gave_up: dict[int, int] = None,
+    item_skipped: dict[int, bool] = None
+) -> dict:
+    """Generate lesson summary from completed objects and dialogue history.
+    
+    Args:
+        plan: The lesson plan
+        completed_objects: Dict mapping object index to correct. correct can be True, False, or None (skipped)
+        dialogue_entries: Dialogue entries; read once, so a generator works
+        item_attempts: Dict mapping object index to attempt count
+        item_hints_used: Dict mapping object index to hints used
+        item_gave_up: Dict mapping object index to gave up count
+        item_skipped: Dict mapping object index to skipped status (True if user said "don't have")
+    """
+    if item_attempts is None:
+        item_attempts = {}
+    if item_hints_used is None:
+        item_hints_used = {}
+    if item_gave_up is None:
+        item_gave_up = {}
+    if item_skipped is None:
+        item_skipped = {}
+    
+    # collect every evaluated user attempt in one pass, grouped by the object tested
+    wanted = {plan.objects[idx].source_name for idx in completed_objects if idx < len(plan.objects)}
+    attempts_by_object: dict[str, list[dict]] = {}
+    for entry in dialogue_entries:
+        if entry.get("speaker") == "user" and entry.get("evaluation"):
+            eval_obj = entry["evaluation"].get("object_tested", {})
+            if isinstance(eval_obj, dict) and eval_obj.get("source_name") in wanted:
+                attempts_by_object.setdefault(eval_obj["source_name"], []).append({
+                    "text": entry.get("text", ""),
+                    "correct": bool(entry["evaluation"].get("correct", False)),
+                })
+    
+    summary_items = []
+    correct_count = 0
+    incorrect_count = 0
+    skipped_count = 0
+    
+    for idx, correct in completed_objects.items():
+        if idx < len(plan.objects):
+            obj = plan.objects[idx]
+            
+            # Check if this object was skipped (user said "don't have")
+            is_skipped = item_skipped.get(idx, False) or correct is None
+            
+            attempts = attempts_by_object.get(obj.source_name, [])
+
+            # choose a representative "user_said" string for backwards compatibility
+            user_text = attempts[-1]["text"] if attempts else ""
+            
+            # Get attempt count for this item (default to 1 if not tracked, 0 if skipped)
+            attempt_count = item_attempts.get(idx, 0 if is_skipped else 1)
+            hints_used = item_hints_used.get(idx, 0)
+            gave_up = item_gave_up.get(idx, 0) > 0  # Convert to boolean
+            
+            summary_items.append({
+                "object": {
+                    "source_name": obj.source_name,
+                    "target_name": obj.target_name,
+                    "action": obj.action,
+                },
+                "correct": correct if not is_skipped else None,
+                "skipped": is_skipped,
+                "user_said": user_text,
+                "correct_word": obj.target_name,
+                "attempts": attempt_count,
+                "hints_used": hints_used,
+                "gave_up": gave_up,
+            })
+            
+            # Update counts
+            if is_skipped:
+                skipped_count += 1
+            elif correct:
+                correct_count += 1
+            else:
+                incorrect_count += 1
+    
+    return {
+        "items": summary_items,
+        "total": len(summary_items),
+        "correct_count": correct_count,
+        "incorrect_count": incorrect_count,
+        "skipped_count": skipped_count,
+    }
+
+
+async def generate_tts_audio(text: str, voice: str = None, state: Optional[SessionState] = None) -> Optional[str]:
+    """Generate TTS audio from text using OpenAI TTS API. Returns base64-encoded audio data."""
+    if not settings.openai_api_key:
+        return None
+    
+    if not text or not text.strip():
+        return None
+    
+    session_id = state.session_id if state else None
+    username = state.username if state else None
+    
+    try:
+        async with track_performance(
+            operation_type="tts",
+            operation_name="generate_tts_audio",
+            session_id=session_id,
+            username=username,
+            metadata={"text_length": len(text), "model": settings.speech_synthesis_model}
+        ):
+            client = AsyncOpenAI(api_key=settings.openai_api_key)
+            voice_to_use = voice or settings.tts_voice
+            
+            response = await client.audio.speech.create(
+                model=settings.speech_synthesis_model,
+                voice=voice_to_use,
+                input=text,
+            )
+            
+            # Read audio bytes
+            audio_bytes = response.content
+            
+            # Encode to base64 for JSON transmission
+            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+            return audio_base64
+    except Exception as e:
+        # Log error but don't fail the request if TTS fails
+        print(f"TTS generation error: {e}")
+        return None
+
+
+# Size of the binary frames used when streaming TTS audio to the client
+TTS_STREAM_CHUNK_SIZE = 16 * 1024
+
+
+async def generate_tts_audio_stream(text: str, voice: str = None, state: Optional[SessionState] = None) -> AsyncIterator[bytes]:
+    """Stream TTS audio from the OpenAI TTS API as raw audio chunks, as soon as they are synthesized."""
+    if not settings.openai_api_key:
+        return
+    
+    if not text or not text.strip():
+        return
+    
+    session_id = state.session_id if state else None
+    username = state.username if state else None
+    
+    async with track_performance(
+        operation_type="tts",
+        operation_name="generate_tts_audio_stream",
+        session_id=session_id,
+        username=username,
+        metadata={"text_length": len(text), "model": settings.speech_synthesis_model}
+    ):
+        client = AsyncOpenAI(api_key=settings.openai_api_key)
+        async with client.audio.speech.with_streaming_response.create(
+            model=settings.speech_synthesis_model,
+            voice=voice or settings.tts_voice,
+            input=text,
+        ) as response:
+            async for chunk in response.iter_bytes(TTS_STREAM_CHUNK_SIZE):
+                yield chunk
+
+
+async def detect_user_intent(
+    transcription: str,
+    context_message: Optional[str] = None,
+    state: Optional[SessionState] = None
+) -> str:
+    """Detect user intent from transcription.
+    
+    Returns:
+        "hint_request": User is asking for a hint
+        "dont_know": User doesn't know the answer or wants the answer
+        "no_object": User doesn't have the object being asked about
+        "answer_attempt": User is attempting to say the word
+    """
+    if not transcription:
+        return "answer_attempt"
+    
+    text_lower = transcription.lower().strip()
+    
+    # Check for hint requests
+    hint_keywords = [
+        "hint", "help", "clue", "give me a hint", "can you help", "i need help",
+        "what's a hint", "ayuda", "pista", "ayúdame"
+    ]
+
+    if any(keyword in text_lower for keyword in hint_keywords):
+        return "hint_request"
+    
+    # Check for "don't have object" - must check before "don't know" to avoid false positives
+    no_object_keywords = [
+        "don't have", "dont have", "do not have", "i don't have",
+        "no tengo", "can't find", "cannot find", "not here",
+        "don't have that", "don't have it", "don't have one",
+        "i don't have that", "i don't have it", "i don't have one",
+        "don't see it", "can't see it", "don't see that",
+        "no lo tengo", "no está aquí", "no lo veo"
+    ]
+
+    if any(keyword in text_lower for keyword in no_object_keywords):
+        return "no_object"
+    
+    # Check for "don't know" / give up
+    dont_know_keywords = [
+        "don't know", "dont know", "no se", "no sé", "i give up", "give up",
+        "tell me", "what is it", "what's the answer", "show me", "i can't",
+        "i dont know", "i don't know", "skip", "pass"
+    ]
+
+    if any(keyword in text_lower for keyword in dont_know_keywords):
+        return "dont_know"
+    
+    # LLM fallback
+    if context_message and settings.openai_api_key:
+        return await detect_user_intent_with_llm(transcription, context_message, state)
+    
+    # Default to answer attempt
+    return "answer_attempt"
+
+
+async def detect_user_intent_with_llm(
+    transcription: str,
+    context_message: str,
+    state: Optional[SessionState] = None
+) -> str:
+    """Detect user intent using LLM with conversation context.
+
+    Returns:
+        "hint_request", "dont_know", "no_object", or "answer_attempt"
+    """
+    if not settings.openai_api_key:
+        logging.warning("OpenAI API key not available for LLM intent detection, defaulting to answer_attempt")
+        return "answer_attempt"
+    
+    try:
+        llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0.0,
+            api_key=settings.openai_api_key
+        )
+        
+        prompt = detect_intent_prompt.invoke({
+            "context_message": context_message or "No previous context",
+            "transcription": transcription
+        })
+        
+        # Track performance if state is available
+        if state and state.session_id:
+            with track_performance("detect_intent_llm", state.session_id):
+                response = await llm.ainvoke(prompt.messages)
+        else:
+            response = await llm.ainvoke(prompt.messages)
+        
+        intent = response.content.strip().lower()
+        
+        # Ensure it's one of the valid intents
+        if intent in ["hint_request", "dont_know", "no_object", "answer_attempt"]:
+            return intent
+        else:
+            logging.warning("LLM returned invalid intent '%s', defaulting to answer_attempt", intent)
+            return "answer_attempt"
+            
+    except Exception as e:
+        logging.error("Error in LLM intent detection: %s", e)
+        # Fallback to answer_attempt on error
+        return "answer_attempt"
+
+
+async def generate_hint(
+    object: Object,
+    target_language: str,
+    source_language: str,
+    hint_number: int,
+    grammar_mode: str = "vocab",
+    grammar_tense: str = "none",
+    grammar_person: Optional[str] = None,
+    state: Optional[SessionState] = None
+) -> str:
+    """Generate a hint for a word using LLM."""
+    if not settings.openai_api_key:
+        return f"Hint: The word starts with '{object.target_name[0]}'."
+    
+    session_id = state.session_id if state else None
+    username = state.username if state else None
+    
+    # Get human-readable label for grammar person
+    grammar_person_label = GRAMMAR_PERSON_LABELS.get(grammar_person, grammar_person) if grammar_person else "none"
+    
+    try:
+        async with track_performance(
+            operation_type="hint_generation",
+            operation_name="generate_hint",
+            session_id=session_id,
+            username=username,
+            metadata={"model": settings.llm_model, "hint_number": hint_number}
+        ):
+            prompt_value = generate_hint_prompt.invoke({
+                "target_word": object.target_name,
+                "source_name": object.source_name,
+                "target_language": target_language,
+                "source_language": source_language,
+                "hint_number": hint_number,
+                "grammar_mode": grammar_mode,
+                "grammar_tense": grammar_tense,
+                "grammar_person": grammar_person_label,
+            })
+            
+            llm = ChatOpenAI(model=settings.llm_model, api_key=settings.openai_api_key)
+            messages = prompt_value.to_messages()
+            response = llm.invoke(messages)
+            return response.content if hasattr(response, 'content') else str(response)
+    except Exception as e:
+        logging.error("Hint generation error: %s", e, exc_info=True)
+        # Fallback hint
+        if hint_number == 1:
+            return f"Hint: The word starts with '{object.target_name[0]}'."
+        else:
+            return f"Hint: The word starts with '{object.target_name[:min(3, len(object.target_name))]}'..."
+
+
+async def give_answer_with_memory_aid(
+    object: Object,
+    target_language: str,
+    source_language: str,
+    grammar_mode: str = "vocab",
+    grammar_tense: str = "none",
+    grammar_person: Optional[str] = None,
+    state: Optional[SessionState] = None
+) -> str:
+    """Give the answer with a memory aid to help student remember.
+    
+    Args:
+        object: The object being tested
+        target_language: Target language
+        source_language: Source language
+        grammar_mode: Practice mode ("vocab" or "grammar")
+        grammar_tense: Grammar tense ("present indicative" or "preterite" if grammar_mode="grammar")
+        grammar_person: Grammatical person for grammar mode (e.g., "first_singular")
+        state: Optional session state for tracking
+        
+    Returns:
+        Message with answer and memory aid
+    """
+    if not settings.openai_api_key:
+        return f"The correct answer is '{object.target_name}'. Please repeat: {object.target_name}"
+    
+    session_id = state.session_id if state else None
+    username = state.username if state else None
+    
+    # Get human-readable label for grammar person
+    grammar_person_label = GRAMMAR_PERSON_LABELS.get(grammar_person, grammar_person) if grammar_person else "none"
+    
+    try:
+        async with track_performance(
+            operation_type="answer_with_memory_aid",
+            operation_name="give_answer_with_memory_aid",
+            session_id=session_id,
+            username=username,
+            metadata={"model": settings.llm_model}
+        ):
+            prompt_value = give_answer_with_memory_aid_prompt.invoke({
+                "target_word": object.target_name,
+                "source_name": object.source_name,
+                "target_language": target_language,
+                "source_language": source_language,
+                "grammar_mode": grammar_mode,
+                "grammar_tense": grammar_tense,
+                "grammar_person": grammar_person_label,
+            })
+            
+            llm = ChatOpenAI(model=settings.llm_model, api_key=settings.openai_api_key)
+            messages = prompt_value.to_messages()
+            response = llm.invoke(messages)
+            return response.content if hasattr(response, 'content') else str(response)
+    except Exception as e:
+        logging.error("Answer with memory aid generation error: %s", e, exc_info=True)
+        # Fallback answer
+        return f"The correct answer is '{object.target_name}'. Please repeat: {object.target_name}"
+
+
+async def evaluate_response(
+    transcription: str,
+    image_data_url: str,
+    plan: Plan,
+    current_object: Object,
+    target_language: str,
+    source_language: str,
+    attempt_number: int = 1,
+    max_attempts: int = 3,
+    grammar_mode: str = "vocab",
+    grammar_tense: str = "none",
+    grammar_person: Optional[str] = None,
+    is_last_object: bool = False,
+    state: Optional[SessionState] = None,
+) -> EvaluationResult:
+    """Evaluate if the user's transcription matches the expected object and word.
+    
+    Args:
+        transcription: User's spoken response
+        image_data_url: Image showing what user is holding/pointing at
+        plan: Lesson plan
+        current_object: Object being tested
+        target_language: Target language
+        source_language: Source language
+        attempt_number: Current attempt number (1-based)
+        max_attempts: Maximum attempts allowed (default 3)
+        grammar_mode: Practice mode ("vocab" or "grammar")
+        grammar_tense: Grammar tense ("present indicative" or "preterite")
+        grammar_person: Grammatical person for grammar mode (e.g., "first_singular")
+        is_last_object: Whether this is the last object in the lesson (default False)
+        state: Optional session state for tracking
+    """
+    if not settings.openai_api_key:
+        raise HTTPException(status_code=500, detail="Missing OPENAI_API_KEY")
+
+    session_id = state.session_id if state else None
+    username = state.username if state else None
+    
+    # Get human-readable label for grammar person
+    grammar_person_label = GRAMMAR_PERSON_LABELS.get(grammar_person, grammar_person) if grammar_person else "none"
+
+    prompt_value = evaluate_response_prompt.invoke({
+        "object_source_name": current_object.source_name,
+        "object_target_name": current_object.target_name,
+        "transcription": transcription,
+        "target_language": target_language,
+        "source_language": source_language,
+        "attempt_number": attempt_number,
+        "max_attempts": max_attempts,
+        "grammar_mode": grammar_mode,
+        "grammar_tense": grammar_tense,
+        "grammar_person": grammar_person_label,
+        "is_last_object": is_last_object,
+    })
+    system_msg = prompt_value.to_messages()[0]
+    user_msg = prompt_value.to_messages()[1]
+    
+    # replace the placeholder in user message with actual image
+    user_content = user_msg.content
+    if isinstance(user_content, str):
+        # find the [provided as image_url] placeholder and replace it
+        user_content = user_content.replace(
+            "[provided as image_url]",
+            ""
+        )
+        user_msg_content = [
+            {"type": "text", "text": user_content},
+            {"type": "image_url", "image_url": {"url": image_data_url}},
+        ]
+    else:
+        user_msg_content = user_content
+
+    user_msg_final = HumanMessage(content=user_msg_content)
+
+    async with track_performance(
+        operation_type="evaluation",
+        operation_name="evaluate_response",
+        session_id=session_id,
+        username=username,
+        metadata={"model": settings.llm_model, "transcription_length": len(transcription)}
+    ):
+        llm = ChatOpenAI(model=settings.llm_model, api_key=settings.openai_api_key)
+        
+        # use structured output for evaluation
+        class EvaluationCheck(BaseModel):
+            correct: bool
+            object_matches: bool
+            word_correct: bool
+            error_category: str | None = None
+            feedback_message: str
+            grammar_correct: bool = True
+        
+        structured = llm.with_structured_output(EvaluationCheck)
+        result = structured.invoke([system_msg, user_msg_final])
+    
+    # If error_category is set, ensure correct is False (safeguard against inconsistent LLM responses)
+    correct_result = result.correct
+    if result.error_category is not None:
+        correct_result = False
+        if result.correct:
+            # Log inconsistency for debugging
+            logging.warning(
+                "LLM returned inconsistent evaluation: correct=True but error_category='%s'. "
+                "Forcing correct=False. Transcription: '%s', Expected: '%s'",
+                result.error_category, transcription, current_object.target_name,
+            )
+    
+    return EvaluationResult(
+        correct=correct_result,
+        object_tested=current_object,
+        correct_word=current_object.target_name,
+        feedback_message=result.feedback_message,
+        transcription=transcription,
+        error_category=result.error_category,
+        attempt_number=attempt_number,
+        grammar_person=grammar_person,
+    )
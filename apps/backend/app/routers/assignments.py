@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Optional
 from app.db.models import AssignmentDoc, UserDataDoc
-from app.dependencies import get_current_teacher
+from app.dependencies import get_current_teacher_id
 from app.db.repository import (
     mark_assignment_complete, 
     get_assignment_completion_status, 
@@ -29,15 +29,15 @@ class CreateAssignmentRequest(BaseModel):
 @router.post("/assignments", response_model=dict)
 async def create_assignment(req: CreateAssignmentRequest):
     """Create a new assignment for a teacher."""
-    teacher = await get_current_teacher(req.email)
+    teacher_id = await get_current_teacher_id(req.email)
 
     # Convert VocabItem objects to dicts for storage
-    vocab_dicts = [{"source_name": v.source_name, "target_name": v.target_name} for v in (req.vocab or [])]
+    vocab_dicts = [v.model_dump() for v in req.vocab] if req.vocab else []
 
     new_assignment = AssignmentDoc(
         title=req.title,
         vocab=vocab_dicts,
-        teacher_id=str(teacher.id),
+        teacher_id=teacher_id,
         scene_id=req.scene_id,
         include_discovered_count=req.include_discovered_count,
         include_grammar=req.include_grammar,
@@ -141,13 +141,13 @@ async def get_assignments(email: str):
 async def get_assignment(assignment_id: str, email: str):
     """Get a single assignment by ID."""
     # Logic similar to basic retrieval, but simplified for detail view
-    teacher = await get_current_teacher(email)
+    teacher_id = await get_current_teacher_id(email)
     
     assignment = await AssignmentDoc.get(assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
         
-    if assignment.teacher_id != str(teacher.id):
+    if assignment.teacher_id != teacher_id:
         raise HTTPException(status_code=403, detail="Not your assignment")
         
     return {
@@ -164,13 +164,13 @@ async def get_assignment(assignment_id: str, email: str):
 @router.delete("/assignments/{assignment_id}")
 async def delete_assignment(assignment_id: str, email: str):
     """Delete an assignment."""
-    teacher = await get_current_teacher(email)
+    teacher_id = await get_current_teacher_id(email)
     
     assignment = await AssignmentDoc.get(assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
         
-    if assignment.teacher_id != str(teacher.id):
+    if assignment.teacher_id != teacher_id:
         raise HTTPException(status_code=403, detail="Not your assignment")
         
     await assignment.delete()
@@ -179,17 +179,17 @@ async def delete_assignment(assignment_id: str, email: str):
 @router.put("/assignments/{assignment_id}")
 async def update_assignment(assignment_id: str, req: CreateAssignmentRequest):
     """Update an assignment."""
-    teacher = await get_current_teacher(req.email)
+    teacher_id = await get_current_teacher_id(req.email)
          
     assignment = await AssignmentDoc.get(assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
         
-    if assignment.teacher_id != str(teacher.id):
+    if assignment.teacher_id != teacher_id:
         raise HTTPException(status_code=403, detail="Not your assignment")
     
     # Convert VocabItem objects to dicts for storage
-    vocab_dicts = [{"source_name": v.source_name, "target_name": v.target_name} for v in (req.vocab or [])]
+    vocab_dicts = [v.model_dump() for v in req.vocab] if req.vocab else []
     
     assignment.title = req.title
     assignment.vocab = vocab_dicts
@@ -249,6 +249,6 @@ async def get_completion_status(assignment_id: str, student_username: str):
 @router.get("/assignments/{assignment_id}/progress")
 async def get_progress(assignment_id: str, teacher_email: str):
     """Get progress for all students on a specific assignment."""
-    teacher = await get_current_teacher(teacher_email)
-    progress = await get_assignment_progress(assignment_id, str(teacher.id))
+    teacher_id = await get_current_teacher_id(teacher_email)
+    progress = await get_assignment_progress(assignment_id, teacher_id)
     return progress
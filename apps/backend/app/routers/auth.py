@@ -4,6 +4,7 @@ from typing import Optional, List
 from datetime import datetime, date, timedelta
 from app.db.models import UserDataDoc
 from app.db.repository import save_user_lesson_db
+from app.dependencies import forget_teacher
 import logging
 
 router = APIRouter(tags=["auth"])
@@ -128,6 +129,7 @@ async def set_user_role(request: dict):
                 break
         
     await user.update({"$set": update_data})
+    forget_teacher(email)
     return {"status": "success", "role": role, "teacher_code": update_data.get("teacher_code")}
 
 @router.get("/auth/me")
@@ -249,14 +251,15 @@ async def get_teacher_students(email: str):
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
         
+    teacher_id = str(teacher.id)
     # Find students linked to this teacher
     import time
     start_time = time.time()
-    students = await UserDataDoc.find(UserDataDoc.teacher_id == str(teacher.id)).to_list()
+    students = await UserDataDoc.find(UserDataDoc.teacher_id == teacher_id).to_list()
     
     # Pre-fetch all assignments to calculate "Assigned Words Practiced" correctly
     from app.db.models import AssignmentDoc
-    assignments = await AssignmentDoc.find(AssignmentDoc.teacher_id == str(teacher.id)).to_list()
+    assignments = await AssignmentDoc.find(AssignmentDoc.teacher_id == teacher_id).to_list()
     
     # Pre-process assignments for lighter iteration
     assignment_reqs = []
@@ -356,8 +359,9 @@ async def get_class_analytics(email: str):
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
         
+    teacher_id = str(teacher.id)
     # Get all students
-    students = await UserDataDoc.find(UserDataDoc.teacher_id == str(teacher.id)).to_list()
+    students = await UserDataDoc.find(UserDataDoc.teacher_id == teacher_id).to_list()
     
     total_correct = 0
     total_incorrect = 0
@@ -409,7 +413,7 @@ async def get_class_analytics(email: str):
     # Calculate Total Assigned Words (Goal)
     # Denominator: Sum of (vocab words + required discovered words) for all assignments
     from app.db.models import AssignmentDoc
-    assignments = await AssignmentDoc.find(AssignmentDoc.teacher_id == str(teacher.id)).to_list()
+    assignments = await AssignmentDoc.find(AssignmentDoc.teacher_id == teacher_id).to_list()
     
     total_denominator = 0
     for assignment in assignments:
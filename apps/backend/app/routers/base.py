@@ -1,10 +1,12 @@
 from __future__ import annotations
 import asyncio
 import base64
+import random
 import io
 import json
 import os
 import warnings
+import orjson
 from typing import Any, AsyncGenerator, Optional
 
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Query
@@ -18,12 +20,39 @@ from pydub import AudioSegment
 warnings.filterwarnings("ignore", category=RuntimeWarning, module="pydub")
 
 from app.core.config import settings
-from app.prompts.chat_prompts import generate_plan_prompt, prompt_next_object, evaluate_response_prompt, generate_hint_prompt, give_answer_with_memory_aid_prompt, detect_intent_prompt, generate_scene_vocab_prompt
+from app.prompts.chat_prompts import generate_plan_prompt, generate_scene_vocab_prompt
 from app.schemas.plan import Plan, Object, SceneVocab, SceneObject
-from app.schemas.evaluation import EvaluationResult
-from app.utils.storage import append_dialogue_entry, save_session_data, load_session_data, list_scenes, save_scene_vocab, load_scene
+from app.utils.ws import send_json
+from app.utils.storage import append_dialogue_entry, save_session_data, iter_session_entries, list_scenes, save_scene_vocab, load_scene
 from app.utils.performance import track_performance
-from app.routers.lesson_graph import create_lesson_graph
+from app.routers.lesson_graph import (
+    COMPILED_GRAPH,
+    HotState,
+    LessonPhase,
+    evaluate_node,
+    feedback_node,
+    flush_dialogue,
+    flush_outbox,
+    forget_session,
+    log_dialogue,
+    persist_lesson,
+    prompt_user_node,
+    save_session,
+    send_welcome_instructions,
+    _assign_grammar_persons,
+    _dump_objects,
+)
+from app.routers._lesson_ops import (
+    detect_user_intent,
+    detect_user_intent_with_llm,
+    evaluate_response,
+    generate_hint,
+    generate_prompt_message,
+    generate_summary,
+    generate_tts_audio,
+    get_next_object_index,
+    give_answer_with_memory_aid,
+)
 from app.db.repository import (
     save_user_lesson_db,
     get_user_progress_db,
@@ -34,8 +63,6 @@ from app.db.models import SceneDoc, UserDataDoc
 import uuid
 from datetime import datetime, timezone
 
-from pydantic import BaseModel
-
 import logging
 
 # Common language names we support -> BCP-47 codes
@@ -84,6 +111,14 @@ def normalize_language_code(language: Optional[str]) -> Optional[str]:
 
 router = APIRouter(tags=["base"])
 
+# Status frames sent on every connect, encoded once
+_WS_CONNECTED_FRAME = orjson.dumps(
+    {"type": "status", "payload": {"code": "ok", "message": "WebSocket connected"}}
+).decode()
+_SCENE_CAPTURE_CONNECTED_FRAME = orjson.dumps(
+    {"type": "status", "payload": {"code": "ok", "message": "Scene capture connected"}}
+).decode()
+
 # Lesson graph will be created per-request with WebSocket binding
 # See invoke_lesson_graph helper function
 
@@ -94,8 +129,6 @@ def session_state_to_lesson_state(
     image_metadata: dict | None = None
 ) -> dict:
     """Convert SessionState to LessonState for graph invocation."""
-    from app.routers.lesson_graph import LessonState
-    
     # Extract image metadata if provided, otherwise use defaults
     if image_metadata:
         target_language = image_metadata.get("target_language", session_state.target_language or "Spanish")
@@ -114,16 +147,19 @@ def session_state_to_lesson_state(
     
     lesson_state: dict = {
         "plan": session_state.plan,
-        "current_object_index": session_state.current_object_index,
-        "completed_objects": session_state.completed_objects.copy() if session_state.completed_objects else [],
+        "_hot": HotState(
+            current_object_index=session_state.current_object_index,
+            waiting_for_repeat=session_state.waiting_for_repeat,
+        ),
+        "completed_objects": session_state.completed_objects.copy() if session_state.completed_objects else {},
         "item_attempts": session_state.item_attempts.copy() if session_state.item_attempts else {},
         "item_hints_used": session_state.item_hints_used.copy() if session_state.item_hints_used else {},
         "item_gave_up": session_state.item_gave_up.copy() if session_state.item_gave_up else {},
         "item_skipped": session_state.item_skipped.copy() if session_state.item_skipped else {},
         "item_grammar_person": session_state.item_grammar_person.copy() if session_state.item_grammar_person else {},
-        "waiting_for_repeat": session_state.waiting_for_repeat,
+        "object_dumps": session_state.object_dumps,
         "welcome_instructions_sent": session_state.welcome_instructions_sent,
-        "lesson_state": "PROMPT_USER",  # Default starting state
+        "lesson_state": LessonPhase.PROMPT_USER,  # Default starting state
         "target_language": target_language,
         "source_language": source_language,
         "location": location,
@@ -140,6 +176,7 @@ def session_state_to_lesson_state(
         "pending_image": session_state.pending_image,
         "evaluation_result": None,
         "prompt_message": None,
+        "_prompt_prefetch": session_state.prompt_prefetch,
     }
     
     return lesson_state
@@ -151,16 +188,21 @@ def lesson_state_to_session_state(
 ) -> SessionState:
     """Update SessionState with values from LessonState after graph execution."""
     session_state.plan = lesson_state.get("plan")
-    session_state.current_object_index = lesson_state.get("current_object_index", -1)
-    session_state.completed_objects = lesson_state.get("completed_objects", []).copy()
+    hot = lesson_state["_hot"]
+    session_state.current_object_index = hot.current_object_index
+    session_state.waiting_for_repeat = hot.waiting_for_repeat
+    # The tracking dicts were copied on the way in and the lesson state is dropped after
+    # this, so they are taken over as is rather than copied again
+    session_state.completed_objects = lesson_state.get("completed_objects", {})
     # Persist attempt counts and hint/gave_up tracking so retries are tracked across graph invocations
-    session_state.item_attempts = lesson_state.get("item_attempts", {}).copy()
-    session_state.item_hints_used = lesson_state.get("item_hints_used", {}).copy()
-    session_state.item_gave_up = lesson_state.get("item_gave_up", {}).copy()
-    session_state.item_skipped = lesson_state.get("item_skipped", {}).copy()
-    session_state.item_grammar_person = lesson_state.get("item_grammar_person", {}).copy()
-    session_state.waiting_for_repeat = lesson_state.get("waiting_for_repeat", False)
+    session_state.item_attempts = lesson_state.get("item_attempts", {})
+    session_state.item_hints_used = lesson_state.get("item_hints_used", {})
+    session_state.item_gave_up = lesson_state.get("item_gave_up", {})
+    session_state.item_skipped = lesson_state.get("item_skipped", {})
+    session_state.item_grammar_person = lesson_state.get("item_grammar_person", {})
+    session_state.object_dumps = lesson_state.get("object_dumps", {})
     session_state.welcome_instructions_sent = lesson_state.get("welcome_instructions_sent", False)
+    session_state.prompt_prefetch = lesson_state.get("_prompt_prefetch")
     
     # Update grammar/practice settings (they might change per request, though typically stable per lesson)
     # Right now exists as a toggle in free practice so a user can change mid-lesson
@@ -192,113 +234,47 @@ async def invoke_lesson_graph(
     Returns:
         Updated LessonState dictionary
     """
-    from app.routers.lesson_graph import create_lesson_graph, evaluate_node, feedback_node, prompt_user_node, send_welcome_instructions
-    
     try:
         if entry_node == "evaluate":
             # For evaluate, manually execute the nodes
             # (LangGraph doesn't support starting from arbitrary nodes)
             # Execute: evaluate -> feedback -> (prompt_user if more objects, else done)
+            # Nodes return only the keys they change, so merge each update into state
             
-            state = await evaluate_node(state, ws)
+            state.update(await evaluate_node(state, ws))
             
-            state = await feedback_node(state, ws)
+            state.update(await feedback_node(state, ws))
             
             # If feedback node set lesson_state to PROMPT_USER, execute prompt_user
-            if state.get("lesson_state") == "PROMPT_USER":
-                state = await prompt_user_node(state, ws)
+            if state.get("lesson_state") == LessonPhase.PROMPT_USER:
+                state.update(await prompt_user_node(state, ws))
             
             return state
         else:
+            # A new plan is starting: assign grammar persons and dump objects for all of its objects up front
+            plan = state.get("plan")
+            if plan and state.get("grammar_mode") == "grammar":
+                state["item_grammar_person"] = _assign_grammar_persons(plan)
+            else:
+                state["item_grammar_person"] = {}
+            state["object_dumps"] = _dump_objects(plan) if plan else {}
+            
             # Send welcome instructions before first prompt (if not already sent)
             if not state.get("welcome_instructions_sent", False):
-                state = await send_welcome_instructions(state, ws)
+                state.update(await send_welcome_instructions(state, ws))
             
             # Default: use graph starting from entry point (prompt_user)
-            graph = create_lesson_graph(ws=ws)
-            result = await graph.ainvoke(state)
+            result = await COMPILED_GRAPH.ainvoke(state, config={"configurable": {"ws": ws}})
             return result
     except Exception as e:
         # Log error and return state as-is w/ error indicator
         logging.error(f"Graph invocation error: {e}", exc_info=True)
-        return {**state, "lesson_state": "FEEDBACK", "_error": str(e)}
-
-
-def get_next_object_index(plan: Plan, completed_objects: list[tuple[int, bool]]) -> int:
-    """Get the next untested object index."""
-    completed_indices = {idx for idx, _ in completed_objects}
-    for i, obj in enumerate(plan.objects):
-        if i not in completed_indices:
-            return i
-    return -1  # all objects tested
+        return {**state, "lesson_state": LessonPhase.FEEDBACK, "_error": str(e)}
+    finally:
+        # Messages produced during this invocation go out together for batching clients
+        await flush_outbox(ws)
 
 
-async def generate_prompt_message(
-    object: Object, 
-    target_language: str, 
-    source_language: str,
-    attempt_number: int = 1,
-    max_attempts: int = 3,
-    grammar_mode: str = "vocab",
-    grammar_tense: str = "none",
-    grammar_person: Optional[str] = None,
-    state: Optional[SessionState] = None
-) -> str:
-    """Generate a prompt message asking user to interact with an object.
-    
-    Args:
-        object: The object to prompt for
-        target_language: Target language for learning
-        source_language: Source language (native language)
-        attempt_number: Current attempt number (1-based)
-        max_attempts: Maximum attempts allowed (default 3)
-        grammar_mode: Practice mode ("vocab" or "grammar")
-        grammar_tense: Grammar tense ("present indicative" or "preterite")
-        grammar_person: Grammatical person for grammar mode (e.g., "first_singular")
-        state: Optional session state for tracking
-    """
-    from app.routers.lesson_graph import GRAMMAR_PERSON_LABELS
-    
-    session_id = state.session_id if state else None
-    username = state.username if state else None
-    is_retry = attempt_number > 1
-    
-    # Get human-readable label for grammar person
-    grammar_person_label = GRAMMAR_PERSON_LABELS.get(grammar_person, grammar_person) if grammar_person else "none"
-    
-    async with track_performance(
-        operation_type="prompt_generation",
-        operation_name="generate_prompt_message",
-        session_id=session_id,
-        username=username,
-        metadata={
-            "model": settings.llm_model, 
-            "target_language": target_language, 
-            "attempt_number": attempt_number,
-            "max_attempts": max_attempts,
-            "grammar_mode": grammar_mode,
-            "grammar_tense": grammar_tense,
-            "grammar_person": grammar_person,
-        }
-    ):
-        prompt_value = prompt_next_object.invoke({
-            "source_name": object.source_name,
-            "target_word": object.target_name,
-            "target_language": target_language,
-            "action": object.action,
-            "source_language": source_language,
-            "attempt_number": attempt_number,
-            "max_attempts": max_attempts,
-            "is_retry": is_retry,
-            "grammar_mode": grammar_mode,
-            "grammar_tense": grammar_tense,
-            "grammar_person": grammar_person_label,
-        })
-        llm = ChatOpenAI(model=settings.llm_model, api_key=settings.openai_api_key)
-        messages = prompt_value.to_messages()
-        response = llm.invoke(messages)
-        return response.content if hasattr(response, 'content') else str(response)
-
 async def process_audio_image_pair(
     ws: WebSocket,
     state: SessionState,
@@ -312,14 +288,13 @@ async def process_audio_image_pair(
     No longer used - logic integrated into LangGraph nodes (TODO: remove later)
     """
     if not state.plan or state.current_object_index < 0:
-        await ws.send_json({"type": "status", "payload": {"code": "error", "message": "No active lesson"}})
+        await send_json(ws, {"type": "status", "payload": {"code": "error", "message": "No active lesson"}})
         return
     
     current_object = state.plan.objects[state.current_object_index]
 
     # Determine if this is the last object in the lesson
-    completed_indices = {idx for idx, _ in state.completed_objects}
-    remaining_objects = len(state.plan.objects) - len(completed_indices)
+    remaining_objects = len(state.plan.objects) - len(state.completed_objects)
     is_last_object = remaining_objects <= 1
 
     # evaluate response
@@ -335,10 +310,10 @@ async def process_audio_image_pair(
             state=state,
         )
     except Exception as e:
-        await ws.send_json({"type": "status", "payload": {"code": "error", "message": f"Evaluation error: {e}"}})
+        await send_json(ws, {"type": "status", "payload": {"code": "error", "message": f"Evaluation error: {e}"}})
         return
     # mark object as completed
-    state.completed_objects.append((state.current_object_index, eval_result.correct))
+    state.completed_objects[state.current_object_index] = eval_result.correct
     
     # save user entry with image and evaluation
     # storing this locally for debugging purposes - TBD if/how to store this long term
@@ -371,7 +346,7 @@ async def process_audio_image_pair(
     if feedback_audio:
         payload["audio"] = feedback_audio
     
-    await ws.send_json({
+    await send_json(ws, {
         "type": "evaluation_result",
         "payload": payload,
     })
@@ -408,7 +383,7 @@ async def process_audio_image_pair(
         if prompt_audio:
             payload["audio"] = prompt_audio
         
-        await ws.send_json({"type": "prompt_next", "payload": payload})
+        await send_json(ws, {"type": "prompt_next", "payload": payload})
         
         if state.session_id:
             append_dialogue_entry(state.session_id, {
@@ -418,11 +393,7 @@ async def process_audio_image_pair(
     else:
         # all objects tested -> generate summary
         if not state.lesson_saved:
-            dialogue_entries = []
-            if state.session_id:
-                session_data = load_session_data(state.session_id)
-                if session_data:
-                    dialogue_entries = session_data.get("entries", [])
+            dialogue_entries = iter_session_entries(state.session_id) if state.session_id else ()
             
             summary = generate_summary(state.plan, state.completed_objects, dialogue_entries, state.item_attempts, state.item_hints_used, state.item_gave_up)
             
@@ -442,103 +413,12 @@ async def process_audio_image_pair(
             
             state.lesson_saved = True
         
-            await ws.send_json({
+            await send_json(ws, {
                 "type": "lesson_complete",
                 "payload": summary,
             })
 
 
-def generate_summary(
-    plan: Plan, 
-    completed_objects: list[tuple[int, bool | None]], 
-    dialogue_entries: list[dict], 
-    item_attempts: dict[int, int] = None,
-    item_hints_used: dict[int, int] = None,
-    item_gave_up: dict[int, int] = None,
-    item_skipped: dict[int, bool] = None
-) -> dict:
-    """Generate lesson summary from completed objects and dialogue history.
-    
-    Args:
-        plan: The lesson plan
-        completed_objects: List of (index, correct) tuples. correct can be True, False, or None (skipped)
-        dialogue_entries: List of dialogue entries
-        item_attempts: Dict mapping object index to attempt count
-        item_hints_used: Dict mapping object index to hints used
-        item_gave_up: Dict mapping object index to gave up count
-        item_skipped: Dict mapping object index to skipped status (True if user said "don't have")
-    """
-    if item_attempts is None:
-        item_attempts = {}
-    if item_hints_used is None:
-        item_hints_used = {}
-    if item_gave_up is None:
-        item_gave_up = {}
-    if item_skipped is None:
-        item_skipped = {}
-    
-    summary_items = []
-    correct_count = 0
-    incorrect_count = 0
-    skipped_count = 0
-    
-    for idx, correct in completed_objects:
-        if idx < len(plan.objects):
-            obj = plan.objects[idx]
-            
-            # Check if this object was skipped (user said "don't have")
-            is_skipped = item_skipped.get(idx, False) or correct is None
-            
-            # collect all attempts for this object
-            attempts: list[dict] = []
-            for entry in dialogue_entries:
-                if entry.get("speaker") == "user" and entry.get("evaluation"):
-                    eval_obj = entry.get("evaluation", {}).get("object_tested", {})
-                    if isinstance(eval_obj, dict) and eval_obj.get("source_name") == obj.source_name:
-                        attempts.append({
-                            "text": entry.get("text", ""),
-                            "correct": bool(entry.get("evaluation", {}).get("correct", False)),
-                        })
-
-            # choose a representative "user_said" string for backwards compatibility
-            user_text = attempts[-1]["text"] if attempts else ""
-            
-            # Get attempt count for this item (default to 1 if not tracked, 0 if skipped)
-            attempt_count = item_attempts.get(idx, 0 if is_skipped else 1)
-            hints_used = item_hints_used.get(idx, 0)
-            gave_up = item_gave_up.get(idx, 0) > 0  # Convert to boolean
-            
-            summary_items.append({
-                "object": {
-                    "source_name": obj.source_name,
-                    "target_name": obj.target_name,
-                    "action": obj.action,
-                },
-                "correct": correct if not is_skipped else None,
-                "skipped": is_skipped,
-                "user_said": user_text,
-                "correct_word": obj.target_name,
-                "attempts": attempt_count,
-                "hints_used": hints_used,
-                "gave_up": gave_up,
-            })
-            
-            # Update counts
-            if is_skipped:
-                skipped_count += 1
-            elif correct:
-                correct_count += 1
-            else:
-                incorrect_count += 1
-    
-    return {
-        "items": summary_items,
-        "total": len(summary_items),
-        "correct_count": correct_count,
-        "incorrect_count": incorrect_count,
-        "skipped_count": skipped_count,
-    }
-
 def save_user_lesson(username: str, session_id: str, summary: dict, output_path: str = "data/user_data/user_lessons.json"):
     """Update JSON file with per-user progress and append session summaries."""
     
@@ -643,14 +523,16 @@ class SessionState:
         # lesson state
         self.plan: Optional[Plan] = None
         self.current_object_index: int = -1
-        self.completed_objects: list[tuple[int, bool]] = []  # List of (index, correct) tuples
+        self.completed_objects: dict[int, bool | None] = {}  # index -> correct (None = skipped)
         self.item_attempts: dict[int, int] = {}  # tracks attempts per item index
         self.item_hints_used: dict[int, int] = {}  # tracks hints used per item (max 2)
         self.item_gave_up: dict[int, int] = {}  # tracks "don't know" count per item (max 2)
         self.item_skipped: dict[int, bool] = {}  # tracks objects skipped due to "don't have" (no penalty)
         self.item_grammar_person: dict[int, str] = {}  # tracks grammar person per object for grammar mode
+        self.object_dumps: dict[int, dict] = {}  # plan objects dumped once per plan, by index
         self.waiting_for_repeat: bool = False  # flag when waiting for user to repeat after being given answer
         self.welcome_instructions_sent: bool = False  # flag when initial session instructions have been sent
+        self.prompt_prefetch: Optional[tuple[tuple, asyncio.Task]] = None  # next prompt rendered ahead of time
         self.dialogue_history: list[dict[str, Any]] = []
         self.lesson_saved: bool = False
         # pending audio/image pairing
@@ -681,46 +563,6 @@ async def stream_llm_tokens(prompt_text: str) -> AsyncGenerator[str, None]:
             yield content
 
 
-async def generate_tts_audio(text: str, voice: str = None, state: Optional[SessionState] = None) -> Optional[str]:
-    """Generate TTS audio from text using OpenAI TTS API. Returns base64-encoded audio data."""
-    if not settings.openai_api_key:
-        return None
-    
-    if not text or not text.strip():
-        return None
-    
-    session_id = state.session_id if state else None
-    username = state.username if state else None
-    
-    try:
-        async with track_performance(
-            operation_type="tts",
-            operation_name="generate_tts_audio",
-            session_id=session_id,
-            username=username,
-            metadata={"text_length": len(text), "model": settings.speech_synthesis_model}
-        ):
-            client = OpenAI(api_key=settings.openai_api_key)
-            voice_to_use = voice or settings.tts_voice
-            
-            response = client.audio.speech.create(
-                model=settings.speech_synthesis_model,
-                voice=voice_to_use,
-                input=text,
-            )
-            
-            # Read audio bytes
-            audio_bytes = response.content
-            
-            # Encode to base64 for JSON transmission
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-            return audio_base64
-    except Exception as e:
-        # Log error but don't fail the request if TTS fails
-        print(f"TTS generation error: {e}")
-        return None
-
-
 async def transcribe_audio_bytes(audio_bytes: bytes, mime: Optional[str], state: Optional[SessionState] = None) -> str:
     """Transcribe buffered audio bytes using OpenAI transcription API."""
     if not settings.openai_api_key:
@@ -823,348 +665,6 @@ async def transcribe_audio_bytes(audio_bytes: bytes, mime: Optional[str], state:
             raise HTTPException(status_code=500, detail=f"Transcription error: {e}")
 
 
-async def detect_user_intent(
-    transcription: str,
-    context_message: Optional[str] = None,
-    state: Optional[SessionState] = None
-) -> str:
-    """Detect user intent from transcription.
-    
-    Returns:
-        "hint_request": User is asking for a hint
-        "dont_know": User doesn't know the answer or wants the answer
-        "no_object": User doesn't have the object being asked about
-        "answer_attempt": User is attempting to say the word
-    """
-    if not transcription:
-        return "answer_attempt"
-    
-    text_lower = transcription.lower().strip()
-    
-    # Check for hint requests
-    hint_keywords = [
-        "hint", "help", "clue", "give me a hint", "can you help", "i need help",
-        "what's a hint", "ayuda", "pista", "ayúdame"
-    ]
-
-    if any(keyword in text_lower for keyword in hint_keywords):
-        return "hint_request"
-    
-    # Check for "don't have object" - must check before "don't know" to avoid false positives
-    no_object_keywords = [
-        "don't have", "dont have", "do not have", "i don't have",
-        "no tengo", "can't find", "cannot find", "not here",
-        "don't have that", "don't have it", "don't have one",
-        "i don't have that", "i don't have it", "i don't have one",
-        "don't see it", "can't see it", "don't see that",
-        "no lo tengo", "no está aquí", "no lo veo"
-    ]
-
-    if any(keyword in text_lower for keyword in no_object_keywords):
-        return "no_object"
-    
-    # Check for "don't know" / give up
-    dont_know_keywords = [
-        "don't know", "dont know", "no se", "no sé", "i give up", "give up",
-        "tell me", "what is it", "what's the answer", "show me", "i can't",
-        "i dont know", "i don't know", "skip", "pass"
-    ]
-
-    if any(keyword in text_lower for keyword in dont_know_keywords):
-        return "dont_know"
-    
-    # LLM fallback
-    if context_message and settings.openai_api_key:
-        return await detect_user_intent_with_llm(transcription, context_message, state)
-    
-    # Default to answer attempt
-    return "answer_attempt"
-
-
-async def detect_user_intent_with_llm(
-    transcription: str,
-    context_message: str,
-    state: Optional[SessionState] = None
-) -> str:
-    """Detect user intent using LLM with conversation context.
-
-    Returns:
-        "hint_request", "dont_know", "no_object", or "answer_attempt"
-    """
-    if not settings.openai_api_key:
-        logging.warning("OpenAI API key not available for LLM intent detection, defaulting to answer_attempt")
-        return "answer_attempt"
-    
-    try:
-        llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.0,
-            api_key=settings.openai_api_key
-        )
-        
-        prompt = detect_intent_prompt.invoke({
-            "context_message": context_message or "No previous context",
-            "transcription": transcription
-        })
-        
-        # Track performance if state is available
-        if state and state.session_id:
-            with track_performance("detect_intent_llm", state.session_id):
-                response = await llm.ainvoke(prompt.messages)
-        else:
-            response = await llm.ainvoke(prompt.messages)
-        
-        intent = response.content.strip().lower()
-        
-        # Ensure it's one of the valid intents
-        if intent in ["hint_request", "dont_know", "no_object", "answer_attempt"]:
-            return intent
-        else:
-            logging.warning(f"LLM returned invalid intent '{intent}', defaulting to answer_attempt")
-            return "answer_attempt"
-            
-    except Exception as e:
-        logging.error(f"Error in LLM intent detection: {e}")
-        # Fallback to answer_attempt on error
-        return "answer_attempt"
-
-
-async def generate_hint(
-    object: Object,
-    target_language: str,
-    source_language: str,
-    hint_number: int,
-    grammar_mode: str = "vocab",
-    grammar_tense: str = "none",
-    grammar_person: Optional[str] = None,
-    state: Optional[SessionState] = None
-) -> str:
-    """Generate a hint for a word using LLM."""
-    from app.routers.lesson_graph import GRAMMAR_PERSON_LABELS
-    
-    if not settings.openai_api_key:
-        return f"Hint: The word starts with '{object.target_name[0]}'."
-    
-    session_id = state.session_id if state else None
-    username = state.username if state else None
-    
-    # Get human-readable label for grammar person
-    grammar_person_label = GRAMMAR_PERSON_LABELS.get(grammar_person, grammar_person) if grammar_person else "none"
-    
-    try:
-        async with track_performance(
-            operation_type="hint_generation",
-            operation_name="generate_hint",
-            session_id=session_id,
-            username=username,
-            metadata={"model": settings.llm_model, "hint_number": hint_number}
-        ):
-            prompt_value = generate_hint_prompt.invoke({
-                "target_word": object.target_name,
-                "source_name": object.source_name,
-                "target_language": target_language,
-                "source_language": source_language,
-                "hint_number": hint_number,
-                "grammar_mode": grammar_mode,
-                "grammar_tense": grammar_tense,
-                "grammar_person": grammar_person_label,
-            })
-            
-            llm = ChatOpenAI(model=settings.llm_model, api_key=settings.openai_api_key)
-            messages = prompt_value.to_messages()
-            response = llm.invoke(messages)
-            return response.content if hasattr(response, 'content') else str(response)
-    except Exception as e:
-        logging.error(f"Hint generation error: {e}", exc_info=True)
-        # Fallback hint
-        if hint_number == 1:
-            return f"Hint: The word starts with '{object.target_name[0]}'."
-        else:
-            return f"Hint: The word starts with '{object.target_name[:min(3, len(object.target_name))]}'..."
-
-
-async def give_answer_with_memory_aid(
-    object: Object,
-    target_language: str,
-    source_language: str,
-    grammar_mode: str = "vocab",
-    grammar_tense: str = "none",
-    grammar_person: Optional[str] = None,
-    state: Optional[SessionState] = None
-) -> str:
-    """Give the answer with a memory aid to help student remember.
-    
-    Args:
-        object: The object being tested
-        target_language: Target language
-        source_language: Source language
-        grammar_mode: Practice mode ("vocab" or "grammar")
-        grammar_tense: Grammar tense ("present indicative" or "preterite" if grammar_mode="grammar")
-        grammar_person: Grammatical person for grammar mode (e.g., "first_singular")
-        state: Optional session state for tracking
-        
-    Returns:
-        Message with answer and memory aid
-    """
-    from app.routers.lesson_graph import GRAMMAR_PERSON_LABELS
-    
-    if not settings.openai_api_key:
-        return f"The correct answer is '{object.target_name}'. Please repeat: {object.target_name}"
-    
-    session_id = state.session_id if state else None
-    username = state.username if state else None
-    
-    # Get human-readable label for grammar person
-    grammar_person_label = GRAMMAR_PERSON_LABELS.get(grammar_person, grammar_person) if grammar_person else "none"
-    
-    try:
-        async with track_performance(
-            operation_type="answer_with_memory_aid",
-            operation_name="give_answer_with_memory_aid",
-            session_id=session_id,
-            username=username,
-            metadata={"model": settings.llm_model}
-        ):
-            prompt_value = give_answer_with_memory_aid_prompt.invoke({
-                "target_word": object.target_name,
-                "source_name": object.source_name,
-                "target_language": target_language,
-                "source_language": source_language,
-                "grammar_mode": grammar_mode,
-                "grammar_tense": grammar_tense,
-                "grammar_person": grammar_person_label,
-            })
-            
-            llm = ChatOpenAI(model=settings.llm_model, api_key=settings.openai_api_key)
-            messages = prompt_value.to_messages()
-            response = llm.invoke(messages)
-            return response.content if hasattr(response, 'content') else str(response)
-    except Exception as e:
-        logging.error(f"Answer with memory aid generation error: {e}", exc_info=True)
-        # Fallback answer
-        return f"The correct answer is '{object.target_name}'. Please repeat: {object.target_name}"
-
-
-async def evaluate_response(
-    transcription: str,
-    image_data_url: str,
-    plan: Plan,
-    current_object: Object,
-    target_language: str,
-    source_language: str,
-    attempt_number: int = 1,
-    max_attempts: int = 3,
-    grammar_mode: str = "vocab",
-    grammar_tense: str = "none",
-    grammar_person: Optional[str] = None,
-    is_last_object: bool = False,
-    state: Optional[SessionState] = None,
-) -> EvaluationResult:
-    """Evaluate if the user's transcription matches the expected object and word.
-    
-    Args:
-        transcription: User's spoken response
-        image_data_url: Image showing what user is holding/pointing at
-        plan: Lesson plan
-        current_object: Object being tested
-        target_language: Target language
-        source_language: Source language
-        attempt_number: Current attempt number (1-based)
-        max_attempts: Maximum attempts allowed (default 3)
-        grammar_mode: Practice mode ("vocab" or "grammar")
-        grammar_tense: Grammar tense ("present indicative" or "preterite")
-        grammar_person: Grammatical person for grammar mode (e.g., "first_singular")
-        is_last_object: Whether this is the last object in the lesson (default False)
-        state: Optional session state for tracking
-    """
-    from app.routers.lesson_graph import GRAMMAR_PERSON_LABELS
-    
-    if not settings.openai_api_key:
-        raise HTTPException(status_code=500, detail="Missing OPENAI_API_KEY")
-
-    session_id = state.session_id if state else None
-    username = state.username if state else None
-    
-    # Get human-readable label for grammar person
-    grammar_person_label = GRAMMAR_PERSON_LABELS.get(grammar_person, grammar_person) if grammar_person else "none"
-
-    prompt_value = evaluate_response_prompt.invoke({
-        "object_source_name": current_object.source_name,
-        "object_target_name": current_object.target_name,
-        "transcription": transcription,
-        "target_language": target_language,
-        "source_language": source_language,
-        "attempt_number": attempt_number,
-        "max_attempts": max_attempts,
-        "grammar_mode": grammar_mode,
-        "grammar_tense": grammar_tense,
-        "grammar_person": grammar_person_label,
-        "is_last_object": is_last_object,
-    })
-    system_msg = prompt_value.to_messages()[0]
-    user_msg = prompt_value.to_messages()[1]
-    
-    # replace the placeholder in user message with actual image
-    user_content = user_msg.content
-    if isinstance(user_content, str):
-        # find the [provided as image_url] placeholder and replace it
-        user_content = user_content.replace(
-            "[provided as image_url]",
-            ""
-        )
-        user_msg_content = [
-            {"type": "text", "text": user_content},
-            {"type": "image_url", "image_url": {"url": image_data_url}},
-        ]
-    else:
-        user_msg_content = user_content
-
-    user_msg_final = HumanMessage(content=user_msg_content)
-
-    async with track_performance(
-        operation_type="evaluation",
-        operation_name="evaluate_response",
-        session_id=session_id,
-        username=username,
-        metadata={"model": settings.llm_model, "transcription_length": len(transcription)}
-    ):
-        llm = ChatOpenAI(model=settings.llm_model, api_key=settings.openai_api_key)
-        
-        # use structured output for evaluation
-        class EvaluationCheck(BaseModel):
-            correct: bool
-            object_matches: bool
-            word_correct: bool
-            error_category: str | None = None
-            feedback_message: str
-            grammar_correct: bool = True
-        
-        structured = llm.with_structured_output(EvaluationCheck)
-        result = structured.invoke([system_msg, user_msg_final])
-    
-    # If error_category is set, ensure correct is False (safeguard against inconsistent LLM responses)
-    correct_result = result.correct
-    if result.error_category is not None:
-        correct_result = False
-        if result.correct:
-            # Log inconsistency for debugging
-            logging.warning(
-                f"LLM returned inconsistent evaluation: correct=True but error_category='{result.error_category}'. "
-                f"Forcing correct=False. Transcription: '{transcription}', Expected: '{current_object.target_name}'"
-            )
-    
-    return EvaluationResult(
-        correct=correct_result,
-        object_tested=current_object,
-        correct_word=current_object.target_name,
-        feedback_message=result.feedback_message,
-        transcription=transcription,
-        error_category=result.error_category,
-        attempt_number=attempt_number,
-        grammar_person=grammar_person,
-    )
-
-
 async def generate_plan_from_data_url(image_data_url: str, target_language: str, source_language: str, location: str, actions: list[str], state: Optional[SessionState] = None) -> Plan:
     """Invoke the structured Plan generator using the image data URL as a multimodal input."""
     if not settings.openai_api_key:
@@ -1293,10 +793,10 @@ async def ws_stream(ws: WebSocket):
     state = SessionState()
 
     async def send_status(message: str, code: str = "ok") -> None:
-        await ws.send_json({"type": "status", "payload": {"code": code, "message": message}})
+        await send_json(ws, {"type": "status", "payload": {"code": code, "message": message}})
 
     try:
-        await send_status("WebSocket connected")
+        await ws.send_text(_WS_CONNECTED_FRAME)
         while True:
             # Expect JSON frames from client for control and data envelope; for raw binary, base64 in JSON is simpler
             raw = await ws.receive_text()
@@ -1318,42 +818,41 @@ async def ws_stream(ws: WebSocket):
                     if username:
                         state.username = username
                         await send_status(f"Username set to: {username}")
+                elif action == "set_capabilities":
+                    # Opt-in protocol features; the lesson graph reads these off the connection
+                    ws.state.audio_streaming = bool(payload.get("audio_streaming", False))
+                    ws.state.batch_frames = bool(payload.get("batch_frames", False))
+                    await send_status("Capabilities updated")
                 elif action == "end_session":
                     # Gracefully finalize current session: build summary from current progress and dialogue
                     if state.plan:
-                        dialogue_entries = []
+                        dialogue_entries = ()
                         if state.session_id:
-                            session_data = load_session_data(state.session_id)
-                            if session_data:
-                                dialogue_entries = session_data.get("entries", [])
+                            await flush_dialogue(state.session_id)
+                            dialogue_entries = iter_session_entries(state.session_id)
 
                         summary = generate_summary(state.plan, state.completed_objects, dialogue_entries, state.item_attempts, state.item_hints_used, state.item_gave_up)
 
-                        if state.session_id:
-                            save_session_data(state.session_id, {
-                                "summary": summary,
-                            })
-
-                        if state.username:
-                            await save_user_lesson_db(
-                                username=state.username,
-                                session_id=state.session_id or "",
-                                summary=summary,
-                                assignment_id=state.assignment_id,
-                                is_self_guided=state.is_self_guided
-                            )
-
-                        state.lesson_saved = True
-
-                        await ws.send_json({
+                        await send_json(ws, {
                             "type": "lesson_complete",
                             "payload": summary,
                         })
 
+                        # Session file and database saves run together in the background
+                        persist_lesson(
+                            state.session_id,
+                            summary,
+                            username=state.username,
+                            assignment_id=state.assignment_id,
+                            is_self_guided=state.is_self_guided,
+                        )
+                        state.lesson_saved = True
+
                     # Reset lesson state
                     state.plan = None
                     state.current_object_index = -1
-                    state.completed_objects = []
+                    state.completed_objects = {}
+                    state.object_dumps = {}
                     state.pending_transcription = None
                     state.pending_image = None
                     # Keep grammar state if client wants to reuse same settings for next session
@@ -1362,7 +861,8 @@ async def ws_stream(ws: WebSocket):
                     # Reset lesson state but keep connection alive
                     state.plan = None
                     state.current_object_index = -1
-                    state.completed_objects = []
+                    state.completed_objects = {}
+                    state.object_dumps = {}
                     state.item_attempts = {}
                     state.item_hints_used = {}
                     state.item_gave_up = {}
@@ -1412,7 +912,7 @@ async def ws_stream(ws: WebSocket):
                 
                 # store transcription, waiting for image to pair
                 state.pending_transcription = (utterance_id, text)
-                await ws.send_json({"type": "asr_final", "payload": {"text": text, "utterance_id": utterance_id}})
+                await send_json(ws, {"type": "asr_final", "payload": {"text": text, "utterance_id": utterance_id}})
                 
                 # check if we have both transcription and image for this utterance_id
                 if state.pending_image and state.pending_image[0] == utterance_id:
@@ -1427,7 +927,7 @@ async def ws_stream(ws: WebSocket):
                     lesson_state = session_state_to_lesson_state(state, ws, image_metadata)
                     lesson_state["pending_transcription"] = (utterance_id, text)
                     lesson_state["pending_image"] = state.pending_image
-                    lesson_state["lesson_state"] = "EVALUATE"
+                    lesson_state["lesson_state"] = LessonPhase.EVALUATE
                     
                     # Invoke graph starting at evaluate node
                     updated_lesson_state = await invoke_lesson_graph(lesson_state, ws, entry_node="evaluate")
@@ -1453,11 +953,11 @@ async def ws_stream(ws: WebSocket):
                 try:
                     async for token in stream_llm_tokens(text):
                         final_text_parts.append(token)
-                        await ws.send_json({"type": "llm_token", "payload": {"token": token}})
+                        await send_json(ws, {"type": "llm_token", "payload": {"token": token}})
                 except Exception as e:
                     await send_status(f"LLM stream error: {e}", code="error")
                     continue
-                await ws.send_json({"type": "llm_final", "payload": {"text": "".join(final_text_parts)}})
+                await send_json(ws, {"type": "llm_final", "payload": {"text": "".join(final_text_parts)}})
 
             elif msg_type == "start_assignment":
                 # Start an assignment-based lesson (plan from vocab, not from image)
@@ -1497,9 +997,6 @@ async def ws_stream(ws: WebSocket):
                 if include_discovered_count > 0 and scene_id and state.username:
                     try:
                         # Get student's discovered words for this scene
-                        from app.db.models import UserDataDoc
-                        import random
-                        
                         user_doc = await UserDataDoc.find_one(UserDataDoc.email == state.username)
                         if not user_doc:
                             await send_status("User not found. Cannot fetch discovered words.", code="error")
@@ -1551,7 +1048,8 @@ async def ws_stream(ws: WebSocket):
                     
                     state.plan = plan
                     state.current_object_index = -1
-                    state.completed_objects = []
+                    state.completed_objects = {}
+                    state.object_dumps = {}
                     state.item_attempts = {}
                     state.item_hints_used = {}
                     state.item_gave_up = {}
@@ -1561,14 +1059,15 @@ async def ws_stream(ws: WebSocket):
                     
                     # Save initial plan to storage
                     if state.session_id:
-                        save_session_data(state.session_id, {
+                        await save_session(state.session_id, {
                             "plan": plan.model_dump(),
                             "entries": [],
+                            "last_system_idx": None,
                             "assignment_id": assignment_id,
                             "is_self_guided": state.is_self_guided,
                         })
                     
-                    await ws.send_json({"type": "plan", "payload": plan.model_dump()})
+                    await send_json(ws, {"type": "plan", "payload": plan.model_dump()})
                     
                     # Convert SessionState to LessonState and invoke graph
                     image_metadata = {
@@ -1581,7 +1080,7 @@ async def ws_stream(ws: WebSocket):
                     }
                     lesson_state = session_state_to_lesson_state(state, ws, image_metadata)
                     lesson_state["plan"] = plan
-                    lesson_state["lesson_state"] = "PROMPT_USER"
+                    lesson_state["lesson_state"] = LessonPhase.PROMPT_USER
                     
                     # Invoke graph starting at prompt_user node
                     try:
@@ -1615,7 +1114,7 @@ async def ws_stream(ws: WebSocket):
                             if prompt_audio:
                                 payload_response["audio"] = prompt_audio
                             
-                            await ws.send_json({"type": "prompt_next", "payload": payload_response})
+                            await send_json(ws, {"type": "prompt_next", "payload": payload_response})
                 
                 except Exception as e:
                     logging.error(f"Error generating plan from assignment: {e}")
@@ -1674,14 +1173,16 @@ async def ws_stream(ws: WebSocket):
                         )
                         state.plan = plan
                         state.current_object_index = -1
-                        state.completed_objects = []
+                        state.completed_objects = {}
+                        state.object_dumps = {}
                         state.session_id = state.session_id or str(uuid.uuid4())
                         
                         # save initial plan to dialogue
                         if state.session_id:
-                            save_session_data(state.session_id, {
+                            await save_session(state.session_id, {
                                 "plan": plan.model_dump(),
                                 "entries": [],
+                                "last_system_idx": None,
                             })
                             # Commented out to prevent scene_message from appearing in transcript
                             # append_dialogue_entry(state.session_id, {
@@ -1689,7 +1190,7 @@ async def ws_stream(ws: WebSocket):
                             #     "text": plan.scene_message,
                             # })
                         
-                        await ws.send_json({"type": "plan", "payload": plan.model_dump()})
+                        await send_json(ws, {"type": "plan", "payload": plan.model_dump()})
                         
                         # Convert SessionState to LessonState and invoke graph
                         image_metadata = {
@@ -1700,7 +1201,7 @@ async def ws_stream(ws: WebSocket):
                         }
                         lesson_state = session_state_to_lesson_state(state, ws, image_metadata)
                         lesson_state["plan"] = plan
-                        lesson_state["lesson_state"] = "PROMPT_USER"
+                        lesson_state["lesson_state"] = LessonPhase.PROMPT_USER
                         
                         # Invoke graph starting at prompt_user node
                         try:
@@ -1732,10 +1233,10 @@ async def ws_stream(ws: WebSocket):
                                 if prompt_audio:
                                     payload["audio"] = prompt_audio
                                 
-                                await ws.send_json({"type": "prompt_next", "payload": payload})
+                                await send_json(ws, {"type": "prompt_next", "payload": payload})
                                 
                                 if state.session_id:
-                                    append_dialogue_entry(state.session_id, {
+                                    log_dialogue(state.session_id, {
                                         "speaker": "system",
                                         "text": prompt_msg,
                                     })
@@ -1755,7 +1256,7 @@ async def ws_stream(ws: WebSocket):
                         lesson_state = session_state_to_lesson_state(state, ws, image_metadata)
                         lesson_state["pending_transcription"] = state.pending_transcription
                         lesson_state["pending_image"] = (utterance_id, data_url, image_metadata)
-                        lesson_state["lesson_state"] = "EVALUATE"
+                        lesson_state["lesson_state"] = LessonPhase.EVALUATE
                         
                         # Invoke graph starting at evaluate node
                         updated_lesson_state = await invoke_lesson_graph(lesson_state, ws, entry_node="evaluate")
@@ -1778,6 +1279,15 @@ async def ws_stream(ws: WebSocket):
         # client disconnected
         pass
     finally:
+        # Drop any prompt still being rendered ahead of time for this session
+        if state.prompt_prefetch:
+            state.prompt_prefetch[1].cancel()
+        # Make sure queued dialogue entries reach disk before the session goes away
+        try:
+            await flush_dialogue(state.session_id)
+        except Exception as e:
+            logging.error(f"Dialogue flush failed: {e}")
+        forget_session(state.session_id)
         # Close only if still connected to avoid double-close RuntimeError
         try:
             if getattr(ws, "client_state", None) not in (WebSocketState.DISCONNECTED, None):
@@ -1806,10 +1316,10 @@ async def ws_scene_capture(ws: WebSocket):
     user_discovered_set: set[str] = set()  # User's previously discovered words (lowercase target names)
     
     async def send_status(message: str, code: str = "ok") -> None:
-        await ws.send_json({"type": "status", "payload": {"code": code, "message": message}})
+        await send_json(ws, {"type": "status", "payload": {"code": code, "message": message}})
     
     try:
-        await send_status("Scene capture connected")
+        await ws.send_text(_SCENE_CAPTURE_CONNECTED_FRAME)
         
         while True:
             raw = await ws.receive_text()
@@ -1901,7 +1411,7 @@ async def ws_scene_capture(ws: WebSocket):
                         session_captured_set.add(target_lower)
                     
                     # Send extracted vocab to client
-                    await ws.send_json({
+                    await send_json(ws, {
                         "type": "vocab_extracted",
                         "payload": {
                             "new_objects": new_objects,
@@ -1924,7 +1434,7 @@ async def ws_scene_capture(ws: WebSocket):
                         if email and scene_id:
                             try:
                                 await add_discovered_words(email, scene_id, captured_objects)
-                                await ws.send_json({
+                                await send_json(ws, {
                                     "type": "session_complete",
                                     "payload": {
                                         "scene_id": scene_id,
@@ -1939,7 +1449,7 @@ async def ws_scene_capture(ws: WebSocket):
                         else:
                             # Fallback local json storage (shouldn't happen but if something like no database connection)
                             scene_data = save_scene_vocab(scene_name, captured_objects)
-                            await ws.send_json({
+                            await send_json(ws, {
                                 "type": "session_complete",
                                 "payload": {
                                     "scene_name": scene_name,
@@ -1948,7 +1458,7 @@ async def ws_scene_capture(ws: WebSocket):
                                 }
                             })
                     else:
-                        await ws.send_json({
+                        await send_json(ws, {
                             "type": "session_complete",
                             "payload": {
                                 "scene_id": scene_id,
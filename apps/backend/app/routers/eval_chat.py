@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import json
 import logging
@@ -56,6 +57,24 @@ class ChatEvalRequest(BaseModel):
     prompt_en: Optional[str] = None
 
 
+# Largest batch /chat_batch accepts; items run concurrently, one model call each
+MAX_BATCH_ITEMS = 32
+
+
+class ChatEvalBatchRequest(BaseModel):
+    items: List[ChatEvalRequest]
+
+
+class ChatEvalBatchItemResult(BaseModel):
+    # What /chat would have answered for this item
+    status_code: int
+    body: dict
+
+
+class ChatEvalBatchResponse(BaseModel):
+    results: List[ChatEvalBatchItemResult]
+
+
 def _ensure_openai_client() -> OpenAI:
     if not settings.openai_api_key:
         raise HTTPException(status_code=500, detail="Missing OPENAI_API_KEY")
@@ -105,10 +124,7 @@ def _parse_json_text(text: str) -> dict:
             detail="Model did not return valid JSON; see backend logs for details.",
         )
 
-@router.post("/chat")
-async def chat_eval(body: ChatEvalRequest):
-    client = _ensure_openai_client()
-
+def _run_chat_eval(client: OpenAI, body: ChatEvalRequest):
     if body.task == "scene_objects":
         if not body.scene_id or not body.scene_image_path:
             raise HTTPException(
@@ -263,3 +279,40 @@ async def chat_eval(body: ChatEvalRequest):
 
     else:
         raise HTTPException(status_code=400, detail=f"Unknown task: {body.task}")
+
+
+@router.post("/chat")
+async def chat_eval(body: ChatEvalRequest):
+    client = _ensure_openai_client()
+    return _run_chat_eval(client, body)
+
+
+def _run_batch_item(client: OpenAI, body: ChatEvalRequest) -> ChatEvalBatchItemResult:
+    """Run one batch item, capturing its error the way /chat would have reported it."""
+    try:
+        result = _run_chat_eval(client, body)
+    except HTTPException as e:
+        return ChatEvalBatchItemResult(status_code=e.status_code, body={"detail": e.detail})
+    except Exception:
+        logging.exception("chat_batch item failed for task=%s", body.task)
+        return ChatEvalBatchItemResult(status_code=500, body={"detail": "Internal Server Error"})
+    return ChatEvalBatchItemResult(status_code=200, body=result.model_dump())
+
+
+@router.post("/chat_batch", response_model=ChatEvalBatchResponse)
+async def chat_eval_batch(body: ChatEvalBatchRequest):
+    """
+    Several /chat requests in one call, sharing one OpenAI client. Items run
+    concurrently on worker threads and each gets its own status and body,
+    so one failing item doesn't fail the batch.
+    """
+    if len(body.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_ITEMS} items per batch",
+        )
+    client = _ensure_openai_client()
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_run_batch_item, client, item) for item in body.items)
+    )
+    return ChatEvalBatchResponse(results=list(results))
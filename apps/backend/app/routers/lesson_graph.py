@@ -1,48 +1,79 @@
 """LangGraph state machine for lesson flow."""
+from dataclasses import dataclass
+from enum import IntEnum
+from functools import partial
 from typing import TypedDict, Literal, Optional
-from fastapi import WebSocket
-from starlette.websockets import WebSocketState
+from fastapi import WebSocket, WebSocketDisconnect
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from app.schemas.plan import Plan, Object
 from app.schemas.evaluation import EvaluationResult
+from app.routers._lesson_ops import (
+    GRAMMAR_PERSONS,
+    GRAMMAR_PERSON_LABELS,
+    detect_user_intent,
+    evaluate_response,
+    generate_hint,
+    generate_prompt_message,
+    generate_summary,
+    generate_tts_audio,
+    generate_tts_audio_stream,
+    get_next_object_index,
+    give_answer_with_memory_aid,
+)
+from app.utils.storage import append_dialogue_entries, iter_session_entries, load_session_data, save_session_data, session_image_path, store_image_once
+from app.db.repository import save_user_lesson_db
+from app.utils.ws import send_json
+import asyncio
 import logging
 import random
+import weakref
+from datetime import datetime
+
+
+def _dump_objects(plan: Plan) -> dict[int, dict]:
+    """Dump every object in the plan once, for reuse in evaluation payloads and dialogue entries."""
+    return {idx: obj.model_dump(mode="json") for idx, obj in enumerate(plan.objects)}
+
+
+def _assign_grammar_persons(plan: Plan) -> dict[int, str]:
+    """Pick a grammar person for every object in the plan in one batch."""
+    return dict(enumerate(random.choices(GRAMMAR_PERSONS, k=len(plan.objects))))
 
 
-# Grammatical persons for grammar mode
-GRAMMAR_PERSONS = [
-    "first_singular",   # I / yo
-    "second_singular",  # you (informal) / tú
-    "third_singular",   # he/she/it / él/ella/usted
-    "first_plural",     # we / nosotros
-    "second_plural",    # you all / vosotros/ustedes
-    "third_plural",     # they / ellos/ellas/ustedes
-]
+class LessonPhase(IntEnum):
+    """Phase of the lesson state machine."""
+    PROMPT_USER = 1
+    AWAIT_RESPONSE = 2
+    EVALUATE = 3
+    FEEDBACK = 4
+    COMPLETE = 5
 
-# Human-readable labels for grammar persons
-GRAMMAR_PERSON_LABELS = {
-    "first_singular": "first person singular (I/yo)",
-    "second_singular": "second person singular (you/tú)",
-    "third_singular": "third person singular (he/she/él/ella)",
-    "first_plural": "first person plural (we/nosotros)",
-    "second_plural": "second person plural (you all/vosotros)",
-    "third_plural": "third person plural (they/ellos)",
-}
+
+@dataclass(slots=True)
+class HotState:
+    """Per-turn fields read on every evaluation, kept as slot attributes rather than dict keys."""
+    current_object_index: int = -1
+    waiting_for_repeat: bool = False  # flag when waiting for user to repeat after being given answer
 
 
 class LessonState(TypedDict, total=False):
-    """State for the lesson graph."""
+    """State for the lesson graph.
+    
+    Nodes return only the keys they change; the graph (or invoke_lesson_graph when
+    running nodes by hand) merges them into the state.
+    """
     plan: Plan | None
-    current_object_index: int
-    completed_objects: list[tuple[int, bool]]  # (index, correct)
+    _hot: HotState  # current_object_index, waiting_for_repeat; returned by any node that changes it
+    completed_objects: dict[int, bool | None]  # index -> correct (None = skipped); latest result wins
     item_attempts: dict[int, int]  # tracks attempts per item index
     item_hints_used: dict[int, int]  # tracks hints used per item (max 2)
     item_gave_up: dict[int, int]  # tracks "don't know" count per item (max 2)
     item_skipped: dict[int, bool]  # tracks objects skipped due to "don't have" (no penalty)
     item_grammar_person: dict[int, str]  # tracks grammar person per object for grammar mode
-    waiting_for_repeat: bool  # flag when waiting for user to repeat after being given answer
+    object_dumps: dict[int, dict]  # plan objects dumped once per plan, by index
     welcome_instructions_sent: bool  # flag when initial session instructions have been sent
-    lesson_state: Literal["PROMPT_USER", "AWAIT_RESPONSE", "EVALUATE", "FEEDBACK", "COMPLETE"]
+    lesson_state: LessonPhase
     target_language: str
     source_language: str
     location: str
@@ -59,6 +90,233 @@ class LessonState(TypedDict, total=False):
     pending_image: tuple[str, str, dict] | None  # (utterance_id, data_url, metadata)
     evaluation_result: EvaluationResult | None
     prompt_message: str | None
+    lesson_completed: bool  # set once the lesson summary has been produced
+    _prompt_prefetch: tuple[tuple, asyncio.Task] | None  # (prompt args, task rendering that prompt) for the likely next object
+
+
+def _streams_audio(ws: WebSocket) -> bool:
+    """Whether the client asked for TTS audio as streamed binary frames (see the set_capabilities control)."""
+    return getattr(ws.state, "audio_streaming", False)
+
+
+def _batches_frames(ws: WebSocket) -> bool:
+    return getattr(ws.state, "batch_frames", False)
+
+
+async def _send_frame(ws: WebSocket, message: dict) -> None:
+    """Send one text frame, which is what the client parses; failures are logged, not raised."""
+    try:
+        await send_json(ws, message)
+    except (WebSocketDisconnect, RuntimeError) as e:
+        # Client went away; starlette raises RuntimeError when sending after close
+        logging.warning("WebSocket send failed for %s: %s", message.get('type'), e)
+    except Exception as e:
+        logging.error("WebSocket send failed for %s: %s", message.get('type'), e, exc_info=True)
+
+
+async def _safe_send(ws: WebSocket | None, message: dict) -> None:
+    """Send a message over the WebSocket; failures (including a closed socket) are logged, not raised.
+
+    Clients that opted into batched frames get the message queued on the connection's
+    outbox instead; flush_outbox sends everything queued as one frame.
+    """
+    if ws is None:
+        return
+    if _batches_frames(ws):
+        if not hasattr(ws.state, "outbox"):
+            ws.state.outbox = []
+        ws.state.outbox.append(message)
+        return
+    await _send_frame(ws, message)
+
+
+async def flush_outbox(ws: WebSocket | None) -> None:
+    """Send the messages queued for a batching client: a lone message as is, several as one `batch` frame."""
+    outbox = getattr(ws.state, "outbox", None) if ws is not None else None
+    if not outbox:
+        return
+    messages = outbox[:]
+    outbox.clear()
+    if len(messages) == 1:
+        await _send_frame(ws, messages[0])
+    else:
+        await _send_frame(ws, {"type": "batch", "messages": messages})
+
+
+async def _send_with_audio(
+    ws: WebSocket | None,
+    msg_type: str,
+    payload: dict,
+    text: str | None,
+    audio: str | None = None,
+) -> None:
+    """Send a message together with TTS audio of `text`.
+    
+    Clients that opted into audio streaming get the message flagged with `audio_start`,
+    then the audio as binary frames while it is synthesized, then an `audio_end` message.
+    Everyone else gets the whole clip base64-encoded in `payload["audio"]`, using
+    `audio` if it was already rendered.
+    """
+    if ws is None:
+        return
+    if text and _streams_audio(ws):
+        await _safe_send(ws, {"type": msg_type, "payload": {**payload, "audio_start": True}})
+        # Binary frames can't be batched, so anything queued has to go out ahead of them
+        await flush_outbox(ws)
+        try:
+            async for chunk in generate_tts_audio_stream(text, state=None):
+                await ws.send_bytes(chunk)
+        except (WebSocketDisconnect, RuntimeError) as e:
+            logging.warning("%s: WS send failed: %s", msg_type, e)
+            return
+        except Exception as e:
+            # TTS streaming failed, but still close the audio stream for the client
+            logging.warning("%s: TTS streaming failed: %s", msg_type, e)
+        await _safe_send(ws, {"type": msg_type, "payload": {"audio_end": True}})
+        return
+    
+    if audio is None and text:
+        try:
+            audio = await generate_tts_audio(text, state=None)
+        except Exception as e:
+            # TTS generation failed, but continue without audio
+            logging.warning("%s: TTS generation failed: %s", msg_type, e)
+    if audio:
+        payload["audio"] = audio
+    await _safe_send(ws, {"type": msg_type, "payload": payload})
+
+
+# Dialogue writers and lesson saves running in the background; referenced here so they aren't garbage collected mid-flight
+_bg_tasks: set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _bg_tasks.add(task)
+    task.add_done_callback(_bg_tasks.discard)
+    return task
+
+
+# Dialogue entries are queued per session and written in batches by a background
+# writer, so lesson nodes never block on the session file. Writers are started on
+# demand and exit once their queue is drained.
+_DIALOGUE_QUEUES: dict[str, asyncio.Queue] = {}
+_DIALOGUE_BATCH_SIZE = 32
+
+# Every write to a session file holds that session's lock, so the dialogue writer,
+# summary saves and plan-start saves never interleave their read-modify-write cycles.
+# Locks are dropped once nothing holds or waits on them.
+_SESSION_LOCKS: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+# The persist_lesson task still running for each session, awaited by flush_dialogue
+_PENDING_SAVES: dict[str, asyncio.Task] = {}
+
+# Text of the newest system entry logged for each session, so evaluate_node can give
+# the intent detector its context without flushing the queue and re-reading the file
+_LAST_SYSTEM_TEXT: dict[str, str] = {}
+
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    lock = _SESSION_LOCKS.get(session_id)
+    if lock is None:
+        lock = _SESSION_LOCKS[session_id] = asyncio.Lock()
+    return lock
+
+
+async def _dialogue_writer(session_id: str, queue: asyncio.Queue) -> None:
+    while True:
+        batch = [await queue.get()]
+        while not queue.empty() and len(batch) < _DIALOGUE_BATCH_SIZE:
+            batch.append(queue.get_nowait())
+        try:
+            async with _session_lock(session_id):
+                await asyncio.to_thread(append_dialogue_entries, session_id, batch)
+        except Exception as e:
+            # Dialogue save failed, but continue
+            logging.error("Dialogue save failed for session %s: %s", session_id, e, exc_info=True)
+        finally:
+            for _ in batch:
+                queue.task_done()
+        if queue.empty():
+            _DIALOGUE_QUEUES.pop(session_id, None)
+            return
+
+
+def log_dialogue(session_id: str, entry: dict) -> None:
+    """Queue a dialogue entry for the session; it is written to disk in the background."""
+    entry.setdefault("timestamp", datetime.now().isoformat())
+    if entry.get("speaker") == "system" and entry.get("text"):
+        _LAST_SYSTEM_TEXT[session_id] = entry["text"]
+    queue = _DIALOGUE_QUEUES.get(session_id)
+    if queue is None:
+        queue = _DIALOGUE_QUEUES[session_id] = asyncio.Queue()
+        _spawn(_dialogue_writer(session_id, queue))
+    queue.put_nowait(entry)
+
+
+async def _flush_queue(session_id: str) -> None:
+    queue = _DIALOGUE_QUEUES.get(session_id)
+    if queue is not None:
+        await queue.join()
+
+
+async def flush_dialogue(session_id: str | None) -> None:
+    """Wait until every queued dialogue entry and any pending lesson save for the session have been written."""
+    if not session_id:
+        return
+    await _flush_queue(session_id)
+    pending = _PENDING_SAVES.get(session_id)
+    if pending is not None:
+        # Shielded so a cancelled caller doesn't take the save down with it
+        await asyncio.shield(pending)
+
+
+async def save_session(session_id: str, data: dict) -> None:
+    """Merge `data` into the session file after everything already queued for the session has landed."""
+    await flush_dialogue(session_id)
+    if "entries" in data:
+        # The dialogue is being replaced, so its last system message no longer applies
+        _LAST_SYSTEM_TEXT.pop(session_id, None)
+    async with _session_lock(session_id):
+        await asyncio.to_thread(save_session_data, session_id, data)
+
+
+def forget_session(session_id: str | None) -> None:
+    """Drop what is kept in memory for a session once its connection has closed."""
+    if session_id:
+        _LAST_SYSTEM_TEXT.pop(session_id, None)
+
+
+async def drain_background_writes() -> None:
+    """Wait for all queued dialogue entries and background saves to finish; called on app shutdown."""
+    for queue in list(_DIALOGUE_QUEUES.values()):
+        await queue.join()
+    while _bg_tasks:
+        await asyncio.gather(*_bg_tasks, return_exceptions=True)
+
+
+async def emit_system(
+    ws: WebSocket | None,
+    session_id: str | None,
+    msg_type: str,
+    text: str,
+    extra: dict | None = None,
+    payload: dict | None = None,
+    audio: str | None = None,
+) -> None:
+    """Speak a system message to the client and record it in the session dialogue.
+    
+    The message payload is `{"text": text, **extra}` unless an explicit `payload` is given.
+    `audio` is pre-rendered base64 TTS of `text`, if any.
+    """
+    if payload is None:
+        payload = {"text": text, **extra} if extra else {"text": text}
+    if session_id:
+        log_dialogue(session_id, {
+            "speaker": "system",
+            "text": text,
+        })
+    await _send_with_audio(ws, msg_type, payload, text, audio)
 
 
 # Hard-coded welcome instructions message
@@ -72,101 +330,69 @@ WELCOME_INSTRUCTIONS_TEXT = (
 )
 
 
+# Per-image settings and their defaults, looked up in image metadata first and lesson state second
+_IMAGE_SETTING_DEFAULTS = (
+    ("target_language", "Spanish"),
+    ("source_language", "English"),
+    ("grammar_mode", "vocab"),
+    ("grammar_tense", "none"),
+)
+
+
+def _coalesce(primary: dict, fallback: dict, keys_defaults: tuple) -> dict:
+    """Resolve each key from primary, then fallback, then its default."""
+    return {k: primary.get(k, fallback.get(k, d)) for k, d in keys_defaults}
+
+
+# Fallback evaluation used when evaluate_response fails; copied with per-turn fields filled in
+_EVAL_FALLBACK = EvaluationResult(
+    correct=False,
+    object_tested=Object(source_name="", target_name="", action=""),
+    correct_word="",
+    feedback_message="Sorry, I had trouble evaluating your response. Please try again.",
+    transcription="",
+    attempt_number=0,
+)
+
+
 async def send_welcome_instructions(state: LessonState, ws: WebSocket) -> LessonState:
     """Send initial session instructions explaining what the user can say/ask for."""
-    from app.routers.base import generate_tts_audio
-    from app.utils.storage import append_dialogue_entry
-    
     # Check if instructions have already been sent
     if state.get("welcome_instructions_sent", False):
-        return state
-    
-    # Generate TTS audio for welcome instructions
-    welcome_audio = None
-    try:
-        welcome_audio = await generate_tts_audio(WELCOME_INSTRUCTIONS_TEXT, state=None)
-    except Exception as e:
-        logging.warning(f"send_welcome_instructions: TTS generation failed: {e}")
-    
-    # Send WebSocket message
-    try:
-        if ws and ws.client_state != WebSocketState.DISCONNECTED:
-            payload = {"text": WELCOME_INSTRUCTIONS_TEXT}
-            if welcome_audio:
-                payload["audio"] = welcome_audio
-            
-            await ws.send_json({
-                "type": "welcome_instructions",
-                "payload": payload
-            })
-        else:
-            logging.warning("send_welcome_instructions: WebSocket disconnected, cannot send instructions")
-    except Exception as e:
-        logging.error(f"send_welcome_instructions: WebSocket send failed: {e}", exc_info=True)
+        return {}
     
-    # Save to dialogue
-    session_id = state.get("session_id")
-    if session_id:
-        try:
-            append_dialogue_entry(session_id, {
-                "speaker": "system",
-                "text": WELCOME_INSTRUCTIONS_TEXT,
-            })
-        except Exception as e:
-            logging.error(f"send_welcome_instructions: Dialogue save failed: {e}", exc_info=True)
+    await emit_system(ws, state.get("session_id"), "welcome_instructions", WELCOME_INSTRUCTIONS_TEXT)
     
     # Mark instructions as sent
-    return {**state, "welcome_instructions_sent": True}
+    return {"welcome_instructions_sent": True}
 
 
-async def prompt_user_node(state: LessonState, ws: WebSocket) -> LessonState:
-    """Prompt user to interact with next object."""
-    # TODO: Refactor circular dependencies to a utils file
-    from app.routers.base import generate_prompt_message, get_next_object_index, generate_tts_audio
-    from app.utils.storage import append_dialogue_entry
-    
-    plan = state.get("plan")
-    if not plan:
-        # No plan available, can't prompt
-        logging.warning("prompt_user_node: No plan available")
-        return {**state, "lesson_state": "AWAIT_RESPONSE"}
-    
-    # Get next object index
-    completed_objects = state.get("completed_objects", [])
-    next_idx = get_next_object_index(plan, completed_objects)
-    
-    if next_idx < 0:
-        # No more objects, should have been handled in feedback node
-        logging.warning("prompt_user_node: No more objects to prompt")
-        return {**state, "lesson_state": "AWAIT_RESPONSE"}
-    
-    if next_idx >= len(plan.objects):
-        # Invalid object index
-        logging.error(f"prompt_user_node: Invalid object index {next_idx} for plan with {len(plan.objects)} objects")
-        return {**state, "lesson_state": "AWAIT_RESPONSE"}
-    
-    current_object = plan.objects[next_idx]
-    target_language = state.get("target_language", "Spanish")
-    source_language = state.get("source_language", "English")
-    
-    # Get grammar mode and tense from state
+def _prompt_args(state: LessonState, plan: Plan, idx: int, item_grammar_person: dict[int, str]) -> tuple:
+    """Arguments for _render_prompt for object `idx`; also identifies a prefetched prompt."""
     grammar_mode = state.get("grammar_mode", "vocab")
-    grammar_tense = state.get("grammar_tense", "none")
-    
-    # Get or assign grammar person for this object (for grammar mode)
-    item_grammar_person = state.get("item_grammar_person", {}) or {}
-    if grammar_mode == "grammar":
-        if next_idx not in item_grammar_person:
-            # Randomly select a grammar person for this object
-            selected_person = random.choice(GRAMMAR_PERSONS)
-            item_grammar_person[next_idx] = selected_person
-        grammar_person = item_grammar_person[next_idx]
-    else:
-        grammar_person = None
-    
-    # Get attempt count for this object
     attempt_counts = state.get("item_attempts", {}) or {}
-    current_attempt = attempt_counts.get(next_idx, 0) + 1  # This will be attempt number
+    return (
+        plan.objects[idx],
+        state.get("target_language", "Spanish"),
+        state.get("source_language", "English"),
+        attempt_counts.get(idx, 0) + 1,  # This will be attempt number
+        grammar_mode,
+        state.get("grammar_tense", "none"),
+        item_grammar_person.get(idx) if grammar_mode == "grammar" else None,
+    )
+
+
+async def _render_prompt(
+    current_object: Object,
+    target_language: str,
+    source_language: str,
+    current_attempt: int,
+    grammar_mode: str,
+    grammar_tense: str,
+    grammar_person: str | None,
+    with_audio: bool,
+) -> tuple[str, str | None]:
+    """Generate the prompt message for an object and, if asked, its base64 TTS audio."""
     max_attempts = 3
     
     # Generate prompt message with attempt context
@@ -187,119 +413,143 @@ async def prompt_user_node(state: LessonState, ws: WebSocket) -> LessonState:
             prompt_msg = f"Please hold up or point to the {current_object.source_name} and say '{current_object.target_name}' in {target_language}."
     except Exception as e:
         # If prompt generation fails, create a fallback prompt
-        logging.error(f"prompt_user_node: Prompt generation failed: {e}", exc_info=True)
+        logging.error("prompt_user_node: Prompt generation failed: %s", e, exc_info=True)
         prompt_msg = f"Please hold up or point to the {current_object.source_name} and say '{current_object.target_name}' in {target_language}."
     
-    # Generate TTS audio for prompt
-    prompt_audio = None
-    try:
-        prompt_audio = await generate_tts_audio(prompt_msg, state=None)
-    except Exception as e:
-        # TTS generation failed, but continue without audio
-        logging.warning(f"prompt_user_node: TTS generation failed: {e}")
+    audio = None
+    if with_audio:
+        try:
+            audio = await generate_tts_audio(prompt_msg, state=None)
+        except Exception as e:
+            # TTS generation failed; the prompt is voiced when it is sent instead
+            logging.warning("prompt_user_node: TTS prefetch failed: %s", e)
+    return prompt_msg, audio
+
+
+async def prompt_user_node(state: LessonState, ws: WebSocket) -> LessonState:
+    """Prompt user to interact with next object."""
+    plan = state.get("plan")
+    if not plan:
+        # No plan available, can't prompt
+        logging.warning("prompt_user_node: No plan available")
+        return {"lesson_state": LessonPhase.AWAIT_RESPONSE}
     
-    # Send WebSocket message
-    try:
-        if ws and ws.client_state != WebSocketState.DISCONNECTED:
-            payload = {
-                "text": prompt_msg,
-                "object_index": next_idx
-            }
-            if prompt_audio:
-                payload["audio"] = prompt_audio
-            
-            await ws.send_json({
-                "type": "prompt_next",
-                "payload": payload
-            })
+    # Get next object index
+    completed_objects = state.get("completed_objects", {})
+    next_idx = get_next_object_index(plan, completed_objects)
+    
+    if next_idx < 0:
+        # No more objects, should have been handled in feedback node
+        logging.warning("prompt_user_node: No more objects to prompt")
+        return {"lesson_state": LessonPhase.AWAIT_RESPONSE}
+    
+    if next_idx >= len(plan.objects):
+        # Invalid object index
+        logging.error("prompt_user_node: Invalid object index %s for plan with %s objects", next_idx, len(plan.objects))
+        return {"lesson_state": LessonPhase.AWAIT_RESPONSE}
+    
+    # Grammar persons are assigned per plan; fill them in here only if grammar
+    # mode was switched on mid-lesson
+    item_grammar_person = state.get("item_grammar_person", {}) or {}
+    if state.get("grammar_mode", "vocab") == "grammar" and not item_grammar_person:
+        item_grammar_person = _assign_grammar_persons(plan)
+    
+    # Use the prompt prefetched while the user answered the previous object, if it
+    # was rendered for exactly this prompt; otherwise drop it and render now
+    prompt_args = _prompt_args(state, plan, next_idx, item_grammar_person)
+    prompt_msg = prompt_audio = None
+    prefetch = state.get("_prompt_prefetch")
+    if prefetch:
+        prefetch_args, prefetch_task = prefetch
+        if prefetch_args == prompt_args and not prefetch_task.cancelled():
+            prompt_msg, prompt_audio = await prefetch_task
         else:
-            logging.warning("prompt_user_node: WebSocket disconnected, cannot send prompt")
-    except Exception as e:
-        # WebSocket send failed, but continue with state update
-        logging.error(f"prompt_user_node: WebSocket send failed: {e}", exc_info=True)
+            prefetch_task.cancel()
+    if prompt_msg is None:
+        prompt_msg, prompt_audio = await _render_prompt(*prompt_args, with_audio=False)
     
-    # Save prompt to dialogue
-    session_id = state.get("session_id")
-    if session_id:
-        try:
-            append_dialogue_entry(session_id, {
-                "speaker": "system",
-                "text": prompt_msg,
-            })
-        except Exception as e:
-            # Dialogue save failed, but continue
-            logging.error(f"prompt_user_node: Dialogue save failed: {e}", exc_info=True)
+    await emit_system(ws, state.get("session_id"), "prompt_next", prompt_msg, {"object_index": next_idx}, audio=prompt_audio)
+    
+    # Start rendering the object most likely to come next while the user answers this one
+    prefetch = None
+    upcoming_idx = get_next_object_index(plan, {**completed_objects, next_idx: True})
+    if upcoming_idx >= 0:
+        upcoming_args = _prompt_args(state, plan, upcoming_idx, item_grammar_person)
+        prefetch = (
+            upcoming_args,
+            asyncio.create_task(_render_prompt(*upcoming_args, with_audio=not _streams_audio(ws))),
+        )
     
-    # Update state
+    # Update state; _hot is returned even though it is changed in place, so the
+    # update doesn't rely on every node sharing the same state object
+    hot = state["_hot"]
+    hot.current_object_index = next_idx
     return {
-        **state,
-        "current_object_index": next_idx,
+        "_hot": hot,
         "item_grammar_person": item_grammar_person,
         "prompt_message": prompt_msg,
-        "lesson_state": "AWAIT_RESPONSE"
+        "_prompt_prefetch": prefetch,
+        "lesson_state": LessonPhase.AWAIT_RESPONSE
     }
 
 
 def await_response_node(state: LessonState) -> LessonState:
     """Waiting for user response - no state change, external trigger needed."""
-    return state
+    return {}
 
 
 async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
     """Evaluate user's response, handle hints and 'don't know', then move to feedback."""
-    from app.routers.base import evaluate_response, generate_tts_audio, detect_user_intent, generate_hint, give_answer_with_memory_aid
-    from app.utils.storage import append_dialogue_entry, load_session_data
-    
     plan = state.get("plan")
     pending_transcription = state.get("pending_transcription")
     pending_image = state.get("pending_image")
-    current_object_index = state.get("current_object_index", -1)
+    hot = state["_hot"]
+    current_object_index = hot.current_object_index
     item_attempts = state.get("item_attempts", {})
     item_hints_used = state.get("item_hints_used", {})
     item_gave_up = state.get("item_gave_up", {})
-    waiting_for_repeat = state.get("waiting_for_repeat", False)
     
     if not plan:
         logging.warning("evaluate_node: No plan available")
-        return {**state, "lesson_state": "FEEDBACK"}
+        return {"lesson_state": LessonPhase.FEEDBACK}
     
     if current_object_index < 0:
         logging.warning("evaluate_node: Invalid current_object_index")
-        return {**state, "lesson_state": "FEEDBACK"}
+        return {"lesson_state": LessonPhase.FEEDBACK}
     
     if not pending_transcription:
         logging.warning("evaluate_node: No pending transcription")
-        return {**state, "lesson_state": "FEEDBACK"}
+        return {"lesson_state": LessonPhase.FEEDBACK}
     
     if not pending_image:
         logging.warning("evaluate_node: No pending image")
-        return {**state, "lesson_state": "FEEDBACK"}
+        return {"lesson_state": LessonPhase.FEEDBACK}
     
     # Extract data
     try:
         utterance_id, transcription = pending_transcription
     except (ValueError, TypeError) as e:
-        logging.error(f"evaluate_node: Invalid pending_transcription format: {e}")
-        return {**state, "lesson_state": "FEEDBACK"}
+        logging.error("evaluate_node: Invalid pending_transcription format: %s", e)
+        return {"lesson_state": LessonPhase.FEEDBACK}
     
     try:
         _, image_data_url, image_metadata = pending_image
     except (ValueError, TypeError) as e:
-        logging.error(f"evaluate_node: Invalid pending_image format: {e}")
-        return {**state, "lesson_state": "FEEDBACK"}
+        logging.error("evaluate_node: Invalid pending_image format: %s", e)
+        return {"lesson_state": LessonPhase.FEEDBACK}
     
     if current_object_index >= len(plan.objects):
         # Invalid object index
-        logging.error(f"evaluate_node: Invalid object index {current_object_index} for plan with {len(plan.objects)} objects")
-        return {**state, "lesson_state": "FEEDBACK"}
+        logging.error("evaluate_node: Invalid object index %s for plan with %s objects", current_object_index, len(plan.objects))
+        return {"lesson_state": LessonPhase.FEEDBACK}
     
     current_object = plan.objects[current_object_index]
-    target_language = image_metadata.get("target_language", state.get("target_language", "Spanish"))
-    source_language = image_metadata.get("source_language", state.get("source_language", "English"))
-    
-    # Extract grammar mode, tense, and person
-    grammar_mode = image_metadata.get("grammar_mode", state.get("grammar_mode", "vocab"))
-    grammar_tense = image_metadata.get("grammar_tense", state.get("grammar_tense", "none"))
+    # Languages and grammar settings: image metadata wins, then lesson state, then defaults
+    cfg = _coalesce(image_metadata, state, _IMAGE_SETTING_DEFAULTS)
+    target_language = cfg["target_language"]
+    source_language = cfg["source_language"]
+    grammar_mode = cfg["grammar_mode"]
+    grammar_tense = cfg["grammar_tense"]
     
     # Get grammar person for this object (assigned in prompt_user_node)
     item_grammar_person = state.get("item_grammar_person", {})
@@ -312,45 +562,51 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
     session_id = state.get("session_id")
     
     # Special case: waiting for repeat after being given the answer
-    if waiting_for_repeat:
+    if hot.waiting_for_repeat:
         # User is repeating after being given answer - just mark as completed (incorrect)
-        completed_objects = state.get("completed_objects", [])
-        completed_objects.append((current_object_index, False))
+        completed_objects = state.get("completed_objects", {})
+        completed_objects[current_object_index] = False
+        hot.waiting_for_repeat = False
         
         # Save dialogue entry
         if session_id:
-            try:
-                append_dialogue_entry(session_id, {
-                    "speaker": "user",
-                    "text": transcription,
-                    "utterance_id": utterance_id,
-                })
-            except Exception:
-                pass
+            log_dialogue(session_id, {
+                "speaker": "user",
+                "text": transcription,
+                "utterance_id": utterance_id,
+            })
         
         # Move on without feedback
         return {
-            **state,
+            "_hot": hot,
             "completed_objects": completed_objects,
-            "waiting_for_repeat": False,
-            "lesson_state": "FEEDBACK",
+            "lesson_state": LessonPhase.FEEDBACK,
             "pending_transcription": None,
             "pending_image": None,
         }
     
-    # Retrieve last system message from dialogue for context
+    # Store the response image once; dialogue entries reference it by content hash,
+    # plus its path relative to the dialogues directory for existing readers.
+    # Decoding, hashing and writing the image run off the event loop.
+    image_ref = image_path = None
+    if session_id:
+        image_ref = await asyncio.to_thread(store_image_once, session_id, image_data_url)
+        if image_ref:
+            image_path = session_image_path(session_id, image_ref)
+    
+    # Last system message before the current user response, for context. It is kept in
+    # memory as it is logged; the session file is only read for a session this process
+    # hasn't logged a system message for, e.g. one continued after a restart.
     last_system_message = None
     if session_id:
-        try:
-            session_data = load_session_data(session_id)
-            if session_data and "entries" in session_data:
-                # Find the last system message before the current user response
-                for entry in reversed(session_data["entries"]):
-                    if entry.get("speaker") == "system" and entry.get("text"):
-                        last_system_message = entry["text"]
-                        break
-        except Exception as e:
-            logging.warning(f"evaluate_node: Failed to retrieve dialogue context: {e}")
+        last_system_message = _LAST_SYSTEM_TEXT.get(session_id)
+        if last_system_message is None:
+            try:
+                session_data = await asyncio.to_thread(load_session_data, session_id)
+                if session_data and session_data.get("last_system_idx") is not None:
+                    last_system_message = session_data["entries"][session_data["last_system_idx"]]["text"]
+            except Exception as e:
+                logging.warning("evaluate_node: Failed to retrieve dialogue context: %s", e)
     
     # Detect user intent (with context for LLM fallback)
     intent = await detect_user_intent(transcription, context_message=last_system_message, state=None)
@@ -359,16 +615,13 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
     if intent == "hint_request":
         # Save user's hint request to dialogue (with image)
         if session_id:
-            try:
-                _, image_data_url, _ = pending_image
-                append_dialogue_entry(session_id, {
-                    "speaker": "user",
-                    "text": transcription,
-                    "utterance_id": utterance_id,
-                    "image_data_url": image_data_url,
-                })
-            except Exception as e:
-                logging.warning(f"evaluate_node: Failed to save hint request to dialogue: {e}")
+            log_dialogue(session_id, {
+                "speaker": "user",
+                "text": transcription,
+                "utterance_id": utterance_id,
+                "image_ref": image_ref,
+                "image_path": image_path,
+            })
         
         hints_used = item_hints_used.get(current_object_index, 0)
         
@@ -391,45 +644,16 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
                 )
                 item_hints_used[current_object_index] = hint_number
             except Exception as e:
-                logging.error(f"evaluate_node: Hint generation failed: {e}", exc_info=True)
+                logging.error("evaluate_node: Hint generation failed: %s", e, exc_info=True)
                 hint_msg = f"Hint: The word starts with '{current_object.target_name[0]}'."
                 item_hints_used[current_object_index] = hint_number
         
-        # Generate TTS for hint
-        hint_audio = None
-        try:
-            hint_audio = await generate_tts_audio(hint_msg, state=None)
-        except Exception as e:
-            logging.warning(f"evaluate_node: TTS generation failed for hint: {e}")
-        
-        # Send hint via WebSocket
-        try:
-            if ws and ws.client_state != WebSocketState.DISCONNECTED:
-                payload = {"text": hint_msg}
-                if hint_audio:
-                    payload["audio"] = hint_audio
-                await ws.send_json({
-                    "type": "hint",
-                    "payload": payload
-                })
-        except Exception as e:
-            logging.error(f"evaluate_node: WebSocket send failed: {e}", exc_info=True)
-        
-        # Save hint to dialogue
-        if session_id:
-            try:
-                append_dialogue_entry(session_id, {
-                    "speaker": "system",
-                    "text": hint_msg,
-                })
-            except Exception:
-                pass
+        await emit_system(ws, session_id, "hint", hint_msg)
         
         # Stay in AWAIT_RESPONSE state
         return {
-            **state,
             "item_hints_used": item_hints_used,
-            "lesson_state": "AWAIT_RESPONSE",
+            "lesson_state": LessonPhase.AWAIT_RESPONSE,
             "pending_transcription": None,
             "pending_image": None,
         }
@@ -438,16 +662,13 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
     if intent == "dont_know":
         # Save user's "don't know" statement to dialogue (with image)
         if session_id:
-            try:
-                _, image_data_url, _ = pending_image
-                append_dialogue_entry(session_id, {
-                    "speaker": "user",
-                    "text": transcription,
-                    "utterance_id": utterance_id,
-                    "image_data_url": image_data_url,
-                })
-            except Exception as e:
-                logging.warning(f"evaluate_node: Failed to save 'don't know' to dialogue: {e}")
+            log_dialogue(session_id, {
+                "speaker": "user",
+                "text": transcription,
+                "utterance_id": utterance_id,
+                "image_ref": image_ref,
+                "image_path": image_path,
+            })
         
         gave_up_count = item_gave_up.get(current_object_index, 0)
         hints_used = item_hints_used.get(current_object_index, 0)
@@ -467,46 +688,18 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
                 )
                 item_gave_up[current_object_index] = gave_up_count + 1
             except Exception as e:
-                logging.error(f"evaluate_node: Answer generation failed: {e}", exc_info=True)
+                logging.error("evaluate_node: Answer generation failed: %s", e, exc_info=True)
                 answer_msg = f"The correct answer is '{current_object.target_name}'. Please repeat: {current_object.target_name}"
                 item_gave_up[current_object_index] = gave_up_count + 1
             
-            # Generate TTS for answer
-            answer_audio = None
-            try:
-                answer_audio = await generate_tts_audio(answer_msg, state=None)
-            except Exception as e:
-                logging.warning(f"evaluate_node: TTS generation failed for answer: {e}")
-            
-            # Send answer via WebSocket
-            try:
-                if ws and ws.client_state != WebSocketState.DISCONNECTED:
-                    payload = {"text": answer_msg}
-                    if answer_audio:
-                        payload["audio"] = answer_audio
-                    await ws.send_json({
-                        "type": "answer_given",
-                        "payload": payload
-                    })
-            except Exception as e:
-                logging.error(f"evaluate_node: WebSocket send failed: {e}", exc_info=True)
-            
-            # Save answer to dialogue
-            if session_id:
-                try:
-                    append_dialogue_entry(session_id, {
-                        "speaker": "system",
-                        "text": answer_msg,
-                    })
-                except Exception:
-                    pass
+            await emit_system(ws, session_id, "answer_given", answer_msg)
             
             # Set waiting_for_repeat flag
+            hot.waiting_for_repeat = True
             return {
-                **state,
+                "_hot": hot,
                 "item_gave_up": item_gave_up,
-                "waiting_for_repeat": True,
-                "lesson_state": "AWAIT_RESPONSE",
+                "lesson_state": LessonPhase.AWAIT_RESPONSE,
                 "pending_transcription": None,
                 "pending_image": None,
             }
@@ -527,47 +720,18 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
                 item_gave_up[current_object_index] = 1
                 item_hints_used[current_object_index] = 1
             except Exception as e:
-                logging.error(f"evaluate_node: Hint generation failed: {e}", exc_info=True)
+                logging.error("evaluate_node: Hint generation failed: %s", e, exc_info=True)
                 hint_msg = f"Hint: The word starts with '{current_object.target_name[0]}'. If you still don't know, you can ask again and I'll tell you the answer."
                 item_gave_up[current_object_index] = 1
                 item_hints_used[current_object_index] = 1
             
-            # Generate TTS for hint
-            hint_audio = None
-            try:
-                hint_audio = await generate_tts_audio(hint_msg, state=None)
-            except Exception as e:
-                logging.warning(f"evaluate_node: TTS generation failed for hint: {e}")
-            
-            # Send hint via WebSocket
-            try:
-                if ws and ws.client_state != WebSocketState.DISCONNECTED:
-                    payload = {"text": hint_msg}
-                    if hint_audio:
-                        payload["audio"] = hint_audio
-                    await ws.send_json({
-                        "type": "hint",
-                        "payload": payload
-                    })
-            except Exception as e:
-                logging.error(f"evaluate_node: WebSocket send failed: {e}", exc_info=True)
-            
-            # Save hint to dialogue
-            if session_id:
-                try:
-                    append_dialogue_entry(session_id, {
-                        "speaker": "system",
-                        "text": hint_msg,
-                    })
-                except Exception:
-                    pass
+            await emit_system(ws, session_id, "hint", hint_msg)
             
             # Stay in AWAIT_RESPONSE state
             return {
-                **state,
                 "item_gave_up": item_gave_up,
                 "item_hints_used": item_hints_used,
-                "lesson_state": "AWAIT_RESPONSE",
+                "lesson_state": LessonPhase.AWAIT_RESPONSE,
                 "pending_transcription": None,
                 "pending_image": None,
             }
@@ -576,16 +740,13 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
     if intent == "no_object":
         # Save user's statement to dialogue
         if session_id:
-            try:
-                _, image_data_url, _ = pending_image
-                append_dialogue_entry(session_id, {
-                    "speaker": "user",
-                    "text": transcription,
-                    "utterance_id": utterance_id,
-                    "image_data_url": image_data_url,
-                })
-            except Exception as e:
-                logging.warning(f"evaluate_node: Failed to save 'no object' to dialogue: {e}")
+            log_dialogue(session_id, {
+                "speaker": "user",
+                "text": transcription,
+                "utterance_id": utterance_id,
+                "image_ref": image_ref,
+                "image_path": image_path,
+            })
         
         # Mark this object as skipped (not correct or incorrect - no penalty)
         item_skipped = state.get("item_skipped", {})
@@ -594,49 +755,20 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
         # Prepare acknowledgment message
         skip_msg = "No problem! Let's move on to the next word."
         
-        # Generate TTS for skip message
-        skip_audio = None
-        try:
-            skip_audio = await generate_tts_audio(skip_msg, state=None)
-        except Exception as e:
-            logging.warning(f"evaluate_node: TTS generation failed for skip message: {e}")
-        
-        # Send skip acknowledgment via WebSocket
-        try:
-            if ws and ws.client_state != WebSocketState.DISCONNECTED:
-                payload = {"text": skip_msg, "skipped": True, "object_index": current_object_index}
-                if skip_audio:
-                    payload["audio"] = skip_audio
-                await ws.send_json({
-                    "type": "object_skipped",
-                    "payload": payload
-                })
-        except Exception as e:
-            logging.error(f"evaluate_node: WebSocket send failed: {e}", exc_info=True)
-        
-        # Save skip message to dialogue
-        if session_id:
-            try:
-                append_dialogue_entry(session_id, {
-                    "speaker": "system",
-                    "text": skip_msg,
-                })
-            except Exception:
-                pass
+        await emit_system(ws, session_id, "object_skipped", skip_msg, {"skipped": True, "object_index": current_object_index})
         
         # Move on to feedback node - will prompt next object or complete lesson
         # We use a special marker in completed_objects to indicate skip (neutral)
         # We'll use None to indicate "skipped" status instead of True/False
-        completed_objects = state.get("completed_objects", [])
-        # Don't add to completed_objects - we track in item_skipped separately
-        # But we need to mark progress so we don't get stuck on this object
-        completed_objects.append((current_object_index, None))  # None = skipped
+        # Skips are also tracked in item_skipped, but we need to mark progress
+        # so we don't get stuck on this object
+        completed_objects = state.get("completed_objects", {})
+        completed_objects[current_object_index] = None  # None = skipped
         
         return {
-            **state,
             "completed_objects": completed_objects,
             "item_skipped": item_skipped,
-            "lesson_state": "FEEDBACK",
+            "lesson_state": LessonPhase.FEEDBACK,
             "pending_transcription": None,
             "pending_image": None,
         }
@@ -644,12 +776,8 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
     # Normal evaluation flow (answer_attempt intent)
 
     # Determine if this is the last object in the lesson
-    completed_objects = state.get("completed_objects", [])
-    # Count unique completed object indices (excluding current one if in progress)
-    completed_indices = {idx for idx, _ in completed_objects}
-    remaining_objects = len(plan.objects) - len(completed_indices)
-    # If we're on the last remaining object, mark as last
-    is_last_object = remaining_objects <= 1
+    # (completed_objects excludes the current one while it is in progress)
+    is_last_object = len(state.get("completed_objects", {})) >= len(plan.objects) - 1
 
     # Evaluate response with attempt context
     try:
@@ -670,109 +798,66 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
         )
     except Exception as e:
         # Evaluation failed, create a default result
-        logging.error(f"evaluate_node: Evaluation failed: {e}", exc_info=True)
-        from app.schemas.evaluation import EvaluationResult
-        eval_result = EvaluationResult(
-            correct=False,
-            object_tested=current_object,
-            correct_word=current_object.target_name,
-            feedback_message=f"Sorry, I had trouble evaluating your response. Please try again.",
-            transcription=transcription,
-            attempt_number=current_attempt,
-        )
+        logging.error("evaluate_node: Evaluation failed: %s", e, exc_info=True)
+        eval_result = _EVAL_FALLBACK.model_copy(update={
+            "object_tested": current_object,
+            "correct_word": current_object.target_name,
+            "transcription": transcription,
+            "attempt_number": current_attempt,
+        })
     
     # Update attempt count for this object (increment after evaluation)
     item_attempts[current_object_index] = current_attempt
 
+    # The plan's objects are dumped once when the plan starts; reuse that dump on every attempt
+    object_dump = (state.get("object_dumps") or {}).get(current_object_index) or current_object.model_dump(mode="json")
+
     # Save user entry with image and evaluation
     session_id = state.get("session_id")
     if session_id:
-        try:
-            append_dialogue_entry(session_id, {
-                "speaker": "user",
-                "text": transcription,
-                "utterance_id": utterance_id,
-                "image_data_url": image_data_url,
-                "evaluation": {
-                    "correct": eval_result.correct,
-                    "object_tested": eval_result.object_tested.model_dump(),
-                    "correct_word": eval_result.correct_word,
-                    "error_category": eval_result.error_category,
-                    "attempt_number": eval_result.attempt_number,
-                },
-            })
-        except Exception:
-            # Dialogue save failed, but continue
-            pass
-    
-    # Generate TTS audio for feedback
-    feedback_audio = None
-    if eval_result.feedback_message:
-        try:
-            feedback_audio = await generate_tts_audio(eval_result.feedback_message, state=None)
-        except Exception as e:
-            # TTS generation failed, but continue without audio
-            logging.warning(f"evaluate_node: TTS generation failed: {e}")
-    
-    # Send evaluation result via WebSocket
-    try:
-        if ws and ws.client_state != WebSocketState.DISCONNECTED:
-            payload = {
-                    "correct": eval_result.correct,
-                    "feedback": eval_result.feedback_message,
-                    "object_index": current_object_index,
-                    "object": current_object.model_dump(),
-                    "correct_word": eval_result.correct_word,
-                    "attempt_number": eval_result.attempt_number,
-                    "error_category": eval_result.error_category,
-            }
-            if feedback_audio:
-                payload["audio"] = feedback_audio
-            
-            await ws.send_json({
-                "type": "evaluation_result",
-                "payload": payload,
-            })
-        else:
-            logging.warning("evaluate_node: WebSocket disconnected, cannot send evaluation result")
-    except Exception as e:
-        # WebSocket send failed, but continue
-        logging.error(f"evaluate_node: WebSocket send failed: {e}", exc_info=True)
+        log_dialogue(session_id, {
+            "speaker": "user",
+            "text": transcription,
+            "utterance_id": utterance_id,
+            "image_ref": image_ref,
+            "image_path": image_path,
+            "evaluation": {
+                "correct": eval_result.correct,
+                "object_tested": object_dump,
+                "correct_word": eval_result.correct_word,
+                "error_category": eval_result.error_category,
+                "attempt_number": eval_result.attempt_number,
+            },
+        })
     
-    # Save system feedback
-    if session_id:
-        try:
-            append_dialogue_entry(session_id, {
-                "speaker": "system",
-                "text": eval_result.feedback_message,
-            })
-        except Exception:
-            # Dialogue save failed, but continue
-            pass
+    # Send evaluation result and save the feedback to dialogue
+    payload = {
+        "correct": eval_result.correct,
+        "feedback": eval_result.feedback_message,
+        "object_index": current_object_index,
+        "object": object_dump,
+        "correct_word": eval_result.correct_word,
+        "attempt_number": eval_result.attempt_number,
+        "error_category": eval_result.error_category,
+    }
+    await emit_system(ws, session_id, "evaluation_result", eval_result.feedback_message, payload=payload)
     
     # Determine if we should mark as completed or allow retry
-    completed_objects = state.get("completed_objects", [])
-
     if eval_result.correct or current_attempt >= max_attempts:
-        # Mark as completed if correct or if this was the last attempt
-        # Remove any existing entry for this object so the latest result wins
-        completed_objects = [
-            (idx, was_correct)
-            for idx, was_correct in completed_objects
-            if idx != current_object_index
-        ]
-        completed_objects.append((current_object_index, eval_result.correct))
+        # Mark as completed if correct or if this was the last attempt (latest result wins)
+        completed_objects = state.get("completed_objects", {})
+        completed_objects[current_object_index] = eval_result.correct
+        hot.waiting_for_repeat = False
 
         # Update state and move to feedback
         return {
-            **state,
+            "_hot": hot,
             "completed_objects": completed_objects,
             "item_attempts": item_attempts,
             "item_hints_used": item_hints_used,
             "item_gave_up": item_gave_up,
-            "waiting_for_repeat": False,
             "evaluation_result": eval_result,
-            "lesson_state": "FEEDBACK",
+            "lesson_state": LessonPhase.FEEDBACK,
             # Clear pending data
             "pending_transcription": None,
             "pending_image": None,
@@ -781,50 +866,97 @@ async def evaluate_node(state: LessonState, ws: WebSocket) -> LessonState:
         # First attempt and incorrect -> allow retry
         # Return to AWAIT_RESPONSE state (don't mark as completed yet)
         return {
-            **state,
             "item_attempts": item_attempts,
             "item_hints_used": item_hints_used,
             "item_gave_up": item_gave_up,
             "evaluation_result": eval_result,
-            "lesson_state": "AWAIT_RESPONSE",
+            "lesson_state": LessonPhase.AWAIT_RESPONSE,
             # Clear pending data so user can try again
             "pending_transcription": None,
             "pending_image": None,
         }
 
 
+async def _save_summary(session_id: str, summary: dict) -> None:
+    try:
+        # Let queued dialogue entries land first so the summary follows them
+        await _flush_queue(session_id)
+        async with _session_lock(session_id):
+            await asyncio.to_thread(save_session_data, session_id, {"summary": summary})
+    except Exception as e:
+        # Save failed, but continue
+        logging.error("Summary save failed for session %s: %s", session_id, e, exc_info=True)
+
+
+async def _save_lesson_db(**kwargs) -> None:
+    try:
+        await save_user_lesson_db(**kwargs)
+    except Exception as e:
+        # DB save failed, but continue
+        logging.error("Lesson save failed for session %s: %s", kwargs.get("session_id"), e, exc_info=True)
+
+
+async def _gather(coros) -> None:
+    await asyncio.gather(*coros)
+
+
+def persist_lesson(
+    session_id: str | None,
+    summary: dict,
+    username: str | None = None,
+    assignment_id: str | None = None,
+    is_self_guided: bool = False,
+) -> asyncio.Task:
+    """Save a finished lesson's summary to the session file and, for a known user, to the database.
+    
+    Both writes run concurrently in one background task, so callers can send
+    lesson_complete without waiting on either. flush_dialogue waits for the task.
+    """
+    saves = []
+    if session_id:
+        saves.append(_save_summary(session_id, summary))
+    if username:
+        saves.append(_save_lesson_db(
+            username=username,
+            session_id=session_id or "",
+            summary=summary,
+            assignment_id=assignment_id,
+            is_self_guided=is_self_guided,
+        ))
+    task = _spawn(_gather(saves))
+    if session_id:
+        _PENDING_SAVES[session_id] = task
+        task.add_done_callback(partial(_clear_pending_save, session_id))
+    return task
+
+
+def _clear_pending_save(session_id: str, task: asyncio.Task) -> None:
+    if _PENDING_SAVES.get(session_id) is task:
+        del _PENDING_SAVES[session_id]
+
+
 async def feedback_node(state: LessonState, ws: WebSocket) -> LessonState:
     """After feedback, check if there are more objects or complete."""
-    from app.routers.base import get_next_object_index, generate_summary
-    from app.utils.storage import load_session_data, save_session_data
-    from app.db.repository import save_user_lesson_db
-    
     plan = state.get("plan")
-    completed_objects = state.get("completed_objects", [])
+    completed_objects = state.get("completed_objects", {})
     
     if not plan:
         logging.warning("feedback_node: No plan available")
-        return {**state, "lesson_state": "COMPLETE"}
+        return {"lesson_state": LessonPhase.COMPLETE}
     
-    completed_indices = {idx for idx, _ in completed_objects}
-    
-    # Check if more objects remain
-    next_idx = get_next_object_index(plan, completed_objects)
+    # completed_objects only holds valid indices, so its size says whether any object is left
+    all_done = len(completed_objects) >= len(plan.objects)
     
-    # If no next index or we've completed all objects, end the lesson
-    if next_idx < 0 or len(completed_indices) >= len(plan.objects):
+    # If we've completed all objects, end the lesson
+    if all_done:
         # All objects tested - generate summary and complete
         session_id = state.get("session_id")
-        dialogue_entries = []
+        dialogue_entries = ()
         
         if session_id:
-            try:
-                session_data = load_session_data(session_id)
-                if session_data:
-                    dialogue_entries = session_data.get("entries", [])
-            except Exception:
-                # Failed to load session data, continue with empty entries
-                pass
+            # Entries are streamed from the session file as the summary consumes them
+            await flush_dialogue(session_id)
+            dialogue_entries = iter_session_entries(session_id)
         
         # Generate summary
         try:
@@ -838,119 +970,82 @@ async def feedback_node(state: LessonState, ws: WebSocket) -> LessonState:
             summary = {
                 "items": [],
                 "total": len(completed_objects),
-                "correct_count": sum(1 for _, correct in completed_objects if correct),
-                "incorrect_count": sum(1 for _, correct in completed_objects if not correct),
+                "correct_count": sum(1 for correct in completed_objects.values() if correct),
+                "incorrect_count": sum(1 for correct in completed_objects.values() if not correct),
             }
         
-        # Save summary to session
-        if session_id:
-            try:
-                save_session_data(session_id, {
-                    "summary": summary,
-                })
-            except Exception:
-                # Save failed, but continue
-                pass
-        
-        # Save to database
-        username = state.get("username")
-        assignment_id = state.get("assignment_id")
-        is_self_guided = state.get("is_self_guided", False)
-        if username and session_id:
-            try:
-                await save_user_lesson_db(
-                    username=username,
-                    session_id=session_id,
-                    summary=summary,
-                    assignment_id=assignment_id,
-                    is_self_guided=is_self_guided
-                )
-            except Exception:
-                # DB save failed, but continue
-                pass
-        
         # Send completion message
-        try:
-            if ws and ws.client_state != WebSocketState.DISCONNECTED:
-                await ws.send_json({
-                    "type": "lesson_complete",
-                    "payload": summary,
-                })
-            else:
-                logging.warning("feedback_node: WebSocket disconnected, cannot send completion message")
-        except Exception as e:
-            # WebSocket send failed, but continue
-            logging.error(f"feedback_node: WebSocket send failed: {e}", exc_info=True)
+        await _safe_send(ws, {
+            "type": "lesson_complete",
+            "payload": summary,
+        })
+        
+        # Save summary to session and to the database in the background
+        if session_id:
+            persist_lesson(
+                session_id,
+                summary,
+                username=state.get("username"),
+                assignment_id=state.get("assignment_id"),
+                is_self_guided=state.get("is_self_guided", False),
+            )
         
         # Mark lesson as completed so the outer session can stop processing new attempts
-        return {**state, "lesson_state": "COMPLETE", "lesson_completed": True}
+        return {"lesson_state": LessonPhase.COMPLETE, "lesson_completed": True}
     else:
         # If the current object is not yet in completed_objects, we are still retrying it.
         # In that case, do NOT send a new prompt; just wait for the next response.
-        current_index = state.get("current_object_index", -1)
-        if current_index not in completed_indices:
+        current_index = state["_hot"].current_object_index
+        if current_index not in completed_objects:
             # Stay on the same object and wait for another attempt
-            return {**state, "lesson_state": "AWAIT_RESPONSE"}
+            return {"lesson_state": LessonPhase.AWAIT_RESPONSE}
         # Otherwise, we have completed the current object, so move on to prompt the next one.
-        return {**state, "lesson_state": "PROMPT_USER"}
+        return {"lesson_state": LessonPhase.PROMPT_USER}
+
 
+async def _ws_bound(node_func, state: LessonState, config: RunnableConfig) -> LessonState:
+    """Run a node with the WebSocket passed in the invocation config; bound per node with functools.partial."""
+    return await node_func(state, config["configurable"]["ws"])
 
-def create_lesson_graph(ws: WebSocket | None = None) -> StateGraph:
-    """Create the lesson state graph with optional WebSocket binding.
+
+def should_continue(state: LessonState) -> Literal["complete", "prompt_user", "retry"]:
+    """Route after feedback: end the lesson, retry the current object, or prompt the next one."""
+    if state.get("lesson_state") == LessonPhase.COMPLETE:
+        return "complete"
     
-    If ws is provided, nodes will be wrapped to receive WebSocket.
-    Otherwise, nodes expect WebSocket to be passed via state or context.
+    plan = state.get("plan")
+    if plan is None:
+        return "complete"
+    
+    completed_objects = state.get("completed_objects", {})
+    if len(completed_objects) >= len(plan.objects):
+        return "complete"
+    
+    # If the current object index is not yet completed, we are still retrying it.
+    if state["_hot"].current_object_index not in completed_objects:
+        return "retry"
+    # Otherwise, move on to prompting the next object.
+    return "prompt_user"
+
+
+def _build_lesson_graph() -> StateGraph:
+    """Build the lesson state graph.
+    
+    The structure is the same for every session, so it is compiled once below.
+    Nodes get the session's WebSocket from config["configurable"]["ws"].
     """
     graph = StateGraph(LessonState)
     
-    # Create wrapper functions that bind WebSocket to async nodes
-    def create_node_wrapper(node_func, ws_param: WebSocket | None):
-        if ws_param is not None:
-            # Bind WebSocket to node function
-            async def wrapped_node(state: LessonState) -> LessonState:
-                return await node_func(state, ws_param)
-            return wrapped_node
-        else:
-            # Return node that expects ws in state or will be bound later
-            async def wrapped_node(state: LessonState) -> LessonState:
-                # Try to get ws from state (won't be there, but handle gracefully)
-                # In practice, ws will be bound when graph is invoked
-                ws_from_context = None  # Will be set via closure in invocation helper
-                return await node_func(state, ws_from_context or state.get("_ws"))
-            return wrapped_node
-    
-    # Add nodes - use wrappers if ws provided, otherwise create placeholders
-    graph.add_node("prompt_user", create_node_wrapper(prompt_user_node, ws))
+    graph.add_node("prompt_user", partial(_ws_bound, prompt_user_node))
     graph.add_node("await_response", await_response_node)
-    graph.add_node("evaluate", create_node_wrapper(evaluate_node, ws))
-    graph.add_node("feedback", create_node_wrapper(feedback_node, ws))
+    graph.add_node("evaluate", partial(_ws_bound, evaluate_node))
+    graph.add_node("feedback", partial(_ws_bound, feedback_node))
     
     # Add edges
     graph.add_edge("prompt_user", "await_response")
     graph.add_edge("evaluate", "feedback")
     
     # Conditional edge from feedback
-    def should_continue(state: LessonState) -> Literal["complete", "prompt_user", "retry"]:
-        lesson_state = state.get("lesson_state", "FEEDBACK")
-        if lesson_state == "COMPLETE":
-            return "complete"
-        
-        plan = state.get("plan")
-        completed_objects = state.get("completed_objects", [])
-        if not plan:
-            return "complete"
-        
-        completed_indices = {idx for idx, _ in completed_objects}
-        if len(completed_indices) >= len(plan.objects):
-            return "complete"
-        
-        current_index = state.get("current_object_index", -1)
-        # If the current object index is not yet completed, we are still retrying it.
-        if current_index not in completed_indices:
-            return "retry"
-        # Otherwise, move on to prompting the next object.
-        return "prompt_user"
-    
     graph.add_conditional_edges("feedback", should_continue, {
         "complete": END,
         "retry": "await_response",
@@ -960,4 +1055,8 @@ def create_lesson_graph(ws: WebSocket | None = None) -> StateGraph:
     # Set entry point to prompt_user (plan generation happens before graph invocation)
     graph.set_entry_point("prompt_user")
     
-    return graph.compile()
\ No newline at end of file
+    return graph
+
+
+# Compiled once at import and shared by all sessions
+COMPILED_GRAPH = _build_lesson_graph().compile()
@@ -1,11 +1,54 @@
 from fastapi import APIRouter, HTTPException, Query
+from beanie import PydanticObjectId, UpdateResponse
+from bson import ObjectId
 from app.db.models import SceneDoc, UserDataDoc
 from typing import List, Optional
 from pydantic import BaseModel
-from app.dependencies import get_current_teacher
+from app.dependencies import get_current_teacher_id
 
 router = APIRouter()
 
+# Fields the scene list endpoints return
+_SCENE_LIST_FIELDS = {
+    "name": 1,
+    "description": 1,
+    "teacher_id": 1,
+    "vocab": 1,
+    "source_language": 1,
+    "target_language": 1,
+    "image_url": 1,
+}
+
+
+def _teacher_scene_query(scene_id: str, teacher_id: str):
+    """Query for a scene owned by the teacher, so ownership is checked in the same query as the read or write."""
+    if not ObjectId.is_valid(scene_id):
+        raise HTTPException(status_code=404, detail="Scene not found")
+    return SceneDoc.find_one(SceneDoc.id == PydanticObjectId(scene_id), SceneDoc.teacher_id == teacher_id)
+
+
+async def _find_teacher_scene(scene_id: str, teacher_id: str) -> SceneDoc:
+    """Load a scene owned by the teacher in one query; missing and not-owned both 404."""
+    scene = await _teacher_scene_query(scene_id, teacher_id)
+    if not scene:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    return scene
+
+
+def _scene_response(scene: SceneDoc) -> dict:
+    """Shape a scene document the way the teacher scene endpoints return it."""
+    return {
+        "id": str(scene.id),
+        "name": scene.name,
+        "description": scene.description,
+        "teacher_id": scene.teacher_id,
+        "vocab": scene.vocab,
+        "source_language": scene.source_language,
+        "target_language": scene.target_language,
+        "image_url": scene.image_url
+    }
+
+
 class VocabItem(BaseModel):
     """Vocabulary item with source and target language translations."""
     source_name: str
@@ -22,153 +65,131 @@ class CreateSceneRequest(BaseModel):
 
 @router.post("/teacher/scenes", response_model=dict)
 async def create_scene(req: CreateSceneRequest):
-    teacher = await get_current_teacher(req.email)
+    teacher_id = await get_current_teacher_id(req.email)
 
     # Convert VocabItem objects to dicts for storage
-    vocab_dicts = [{"source_name": v.source_name, "target_name": v.target_name} for v in (req.vocab or [])]
+    vocab_dicts = [v.model_dump() for v in req.vocab] if req.vocab else []
     
     new_scene = SceneDoc(
         name=req.name,
         description=req.description,
-        teacher_id=str(teacher.id),
+        teacher_id=teacher_id,
         vocab=vocab_dicts,
         source_language=req.source_language,
         target_language=req.target_language
     )
     await new_scene.insert()
     
-    return {
-        "id": str(new_scene.id),
-        "name": new_scene.name,
-        "description": new_scene.description,
-        "teacher_id": new_scene.teacher_id,
-        "vocab": new_scene.vocab,
-        "source_language": new_scene.source_language,
-        "target_language": new_scene.target_language,
-        "image_url": new_scene.image_url
-    }
+    return _scene_response(new_scene)
 
 @router.get("/teacher/scenes", response_model=List[dict])
 async def get_scenes(email: str):
-    teacher = await get_current_teacher(email)
-    scenes = await SceneDoc.find(SceneDoc.teacher_id == str(teacher.id)).to_list()
+    teacher_id = await get_current_teacher_id(email)
+    # Raw projected documents, shaped straight into the response without building SceneDocs
+    cursor = SceneDoc.find(SceneDoc.teacher_id == teacher_id).aggregate([{"$project": _SCENE_LIST_FIELDS}])
     
     return [
         {
-            "id": str(s.id),
-            "name": s.name,
-            "description": s.description,
-            "teacher_id": s.teacher_id,
-            "vocab": getattr(s, 'vocab', []),
-            "source_language": getattr(s, 'source_language', 'English'),
-            "target_language": getattr(s, 'target_language', 'Spanish'),
-            "image_url": s.image_url
+            "id": str(d["_id"]),
+            "name": d["name"],
+            "description": d["description"],
+            "teacher_id": d["teacher_id"],
+            "vocab": d.get("vocab", []),
+            "source_language": d.get("source_language", "English"),
+            "target_language": d.get("target_language", "Spanish"),
+            "image_url": d.get("image_url")
         }
-        for s in scenes
+        async for d in cursor
     ]
 
 @router.get("/teacher/scenes/{scene_id}")
 async def get_scene(scene_id: str, email: str):
     """Get a single scene by ID."""
-    teacher = await get_current_teacher(email)
-    
-    scene = await SceneDoc.get(scene_id)
-    if not scene:
-        raise HTTPException(status_code=404, detail="Scene not found")
-        
-    if scene.teacher_id != str(teacher.id):
-        raise HTTPException(status_code=403, detail="Not your scene")
-        
-    return {
-        "id": str(scene.id),
-        "name": scene.name,
-        "description": scene.description,
-        "teacher_id": scene.teacher_id,
-        "vocab": getattr(scene, 'vocab', []),
-        "source_language": getattr(scene, 'source_language', 'English'),
-        "target_language": getattr(scene, 'target_language', 'Spanish'),
-        "image_url": scene.image_url
-    }
+    teacher_id = await get_current_teacher_id(email)
+    scene = await _find_teacher_scene(scene_id, teacher_id)
+    return _scene_response(scene)
 
 @router.delete("/teacher/scenes/{scene_id}")
 async def delete_scene(scene_id: str, email: str):
     """Delete a scene."""
-    teacher = await get_current_teacher(email)
-
-    scene = await SceneDoc.get(scene_id)
-    if not scene:
+    teacher_id = await get_current_teacher_id(email)
+    result = await _teacher_scene_query(scene_id, teacher_id).delete()
+    if not result or result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Scene not found")
-
-    if scene.teacher_id != str(teacher.id):
-        raise HTTPException(status_code=403, detail="Not your scene")
-
-    await scene.delete()
     return {"status": "success"}
 
 @router.put("/teacher/scenes/{scene_id}")
 async def update_scene(scene_id: str, req: CreateSceneRequest):
     """Update a scene."""
-    teacher = await get_current_teacher(req.email)
-
-    scene = await SceneDoc.get(scene_id)
-    if not scene:
-        raise HTTPException(status_code=404, detail="Scene not found")
-
-    if scene.teacher_id != str(teacher.id):
-        raise HTTPException(status_code=403, detail="Not your scene")
+    teacher_id = await get_current_teacher_id(req.email)
 
     # Convert VocabItem objects to dicts for storage
-    vocab_dicts = [{"source_name": v.source_name, "target_name": v.target_name} for v in (req.vocab or [])]
+    vocab_dicts = [v.model_dump() for v in req.vocab] if req.vocab else []
 
-    scene.name = req.name
-    scene.description = req.description
-    scene.vocab = vocab_dicts
-    scene.source_language = req.source_language
-    scene.target_language = req.target_language
-    
-    await scene.save()
-    return {
-        "id": str(scene.id),
-        "name": scene.name,
-        "description": scene.description,
-        "teacher_id": scene.teacher_id,
-        "vocab": scene.vocab,
-        "source_language": scene.source_language,
-        "target_language": scene.target_language,
-        "image_url": scene.image_url
-    }
+    # Ownership check and update in one round trip, returning the updated scene
+    scene = await _teacher_scene_query(scene_id, teacher_id).update(
+        {"$set": {
+            "name": req.name,
+            "description": req.description,
+            "vocab": vocab_dicts,
+            "source_language": req.source_language,
+            "target_language": req.target_language,
+        }},
+        response_type=UpdateResponse.NEW_DOCUMENT,
+    )
+    if not scene:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    return _scene_response(scene)
 
 
 @router.get("/student/scenes", response_model=List[dict])
 async def get_student_scenes(email: str):
     """Get scenes for a student's enrolled class (teacher-created scenes)."""
-    user = await UserDataDoc.find_one(UserDataDoc.email == email)
-    if not user:
-        return []
-    
-    # Find the teacher ID - either directly or via class code
-    teacher_id = user.teacher_id
-    if not teacher_id and user.class_code:
-        teacher = await UserDataDoc.find_one(UserDataDoc.teacher_code == user.class_code)
-        if teacher:
-            teacher_id = str(teacher.id)
-    
-    if not teacher_id:
-        return []
-    
-    # Get scenes created by the teacher
-    scenes = await SceneDoc.find(SceneDoc.teacher_id == teacher_id).to_list()
+    # One pipeline instead of up to three round trips: the student, the teacher owning
+    # their class code (only if no teacher_id is set), then that teacher's scenes
+    # (Mongo treats "" as true, so empty strings are compared for explicitly)
+    has_teacher_id = {"$ne": [{"$ifNull": ["$teacher_id", ""]}, ""]}
+    pipeline = [
+        {"$limit": 1},
+        {"$lookup": {
+            "from": UserDataDoc.Settings.name,
+            "let": {"code": {"$cond": [has_teacher_id, "", {"$ifNull": ["$class_code", ""]}]}},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [{"$ne": ["$$code", ""]}, {"$eq": ["$teacher_code", "$$code"]}]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 1}},
+            ],
+            "as": "class_teacher",
+        }},
+        {"$project": {"teacher_id": {"$cond": [
+            has_teacher_id,
+            "$teacher_id",
+            {"$toString": {"$arrayElemAt": ["$class_teacher._id", 0]}},
+        ]}}},
+        {"$lookup": {
+            "from": SceneDoc.Settings.name,
+            "let": {"teacher_id": "$teacher_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [{"$ne": ["$$teacher_id", None]}, {"$eq": ["$teacher_id", "$$teacher_id"]}]}}},
+                {"$project": _SCENE_LIST_FIELDS},
+            ],
+            "as": "scenes",
+        }},
+        {"$unwind": "$scenes"},
+        {"$replaceRoot": {"newRoot": "$scenes"}},
+    ]
+    cursor = UserDataDoc.find(UserDataDoc.email == email).aggregate(pipeline)
     
     return [
         {
-            "id": str(s.id),
-            "name": s.name,
-            "description": s.description,
-            "vocab": getattr(s, 'vocab', []),
-            "source_language": getattr(s, 'source_language', 'English'),
-            "target_language": getattr(s, 'target_language', 'Spanish'),
+            "id": str(d["_id"]),
+            "name": d["name"],
+            "description": d["description"],
+            "vocab": d.get("vocab", []),
+            "source_language": d.get("source_language", "English"),
+            "target_language": d.get("target_language", "Spanish"),
         }
-        for s in scenes
+        async for d in cursor
     ]
 
 
@@ -187,22 +208,19 @@ async def get_student_discovered_words(email: str):
         }
     
     # Aggregate all words from discovered_scene_words
-    all_words: List[dict] = []
+    # First occurrence of each word, keyed by case-folded target_name for deduplication
+    words_by_key: dict[str, dict] = {}
     by_scene: dict = {}
-    seen_words = set()  # For deduplication by target_name (case-insensitive)
     
     if user.discovered_scene_words:
+        # Look up every scene's name in one query instead of one per scene
+        scene_oids = [ObjectId(sid) for sid in user.discovered_scene_words if ObjectId.is_valid(sid)]
+        cursor = SceneDoc.find({"_id": {"$in": scene_oids}}).aggregate([{"$project": {"name": 1}}])
+        name_by_id = {str(d["_id"]): d["name"] async for d in cursor}
+        
         for scene_id, words in user.discovered_scene_words.items():
             scene_words = []
-            
-            # Get scene name
-            scene_name = "Unknown Scene"
-            try:
-                scene = await SceneDoc.get(scene_id)
-                if scene:
-                    scene_name = scene.name
-            except Exception:
-                pass
+            scene_name = name_by_id.get(scene_id, "Unknown Scene")
             
             for word in words:
                 # Normalize word format (handle legacy string format)
@@ -219,20 +237,13 @@ async def get_student_discovered_words(email: str):
                 if not source_name or not target_name:
                     continue
                 
-                # Track by scene
-                scene_words.append({
+                # Track by scene; the same item is shared with the deduplicated list
+                item = {
                     "source_name": source_name,
                     "target_name": target_name
-                })
-                
-                # Deduplicate for all_words list
-                key = target_name.lower()
-                if key not in seen_words:
-                    seen_words.add(key)
-                    all_words.append({
-                        "source_name": source_name,
-                        "target_name": target_name
-                    })
+                }
+                scene_words.append(item)
+                words_by_key.setdefault(target_name.casefold(), item)
             
             if scene_words:
                 by_scene[scene_id] = {
@@ -241,6 +252,7 @@ async def get_student_discovered_words(email: str):
                     "count": len(scene_words)
                 }
     
+    all_words = list(words_by_key.values())
     return {
         "words": all_words,
         "total": len(all_words),
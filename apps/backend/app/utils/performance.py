@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import time
 from typing import Optional, Any
 from contextlib import asynccontextmanager
@@ -6,6 +7,57 @@ from app.core.config import settings
 from app.db.models import PerformanceMetricDoc
 
 
+# Metrics are queued and written in batches by one background writer, so tracked
+# operations never wait on Mongo. The writer is started with the first metric.
+_METRICS_QUEUE_MAX = 10_000
+_METRICS_BATCH_SIZE = 100
+_METRICS_FLUSH_SECONDS = 0.5
+_metrics_queue: asyncio.Queue | None = None
+_metrics_writer: asyncio.Task | None = None
+
+
+async def _write_metrics(queue: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        # Collect up to a batch, or whatever arrives within the flush interval
+        batch = [await queue.get()]
+        deadline = loop.time() + _METRICS_FLUSH_SECONDS
+        while len(batch) < _METRICS_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await PerformanceMetricDoc.insert_many(batch)
+        except Exception as e:
+            print(f"Failed to save {len(batch)} performance metrics: {e}")
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+def _enqueue_metric(metric: PerformanceMetricDoc) -> None:
+    global _metrics_queue, _metrics_writer
+    if _metrics_queue is None:
+        _metrics_queue = asyncio.Queue(maxsize=_METRICS_QUEUE_MAX)
+    try:
+        _metrics_queue.put_nowait(metric)
+    except asyncio.QueueFull:
+        # Metrics are best effort; drop rather than grow without bound if Mongo falls behind
+        return
+    if _metrics_writer is None or _metrics_writer.done():
+        _metrics_writer = asyncio.create_task(_write_metrics(_metrics_queue))
+
+
+async def flush_metrics() -> None:
+    """Wait until every queued metric has been written (e.g. on shutdown)."""
+    if _metrics_queue is not None:
+        await _metrics_queue.join()
+
+
 @asynccontextmanager
 async def track_performance(
     operation_type: str,
@@ -30,7 +82,7 @@ async def track_performance(
     finally:
         duration_ms = (time.perf_counter() - start_time) * 1000
         
-        # Save to database asynchronously (don't block)
+        # Queue for the background writer (don't block)
         try:
             metric = PerformanceMetricDoc(
                 session_id=session_id or "unknown",
@@ -40,7 +92,7 @@ async def track_performance(
                 duration_ms=duration_ms,
                 metadata=metadata or {}
             )
-            await metric.insert()
+            _enqueue_metric(metric)
         except Exception as e:
             # Don't fail the operation if metrics saving fails
             print(f"Failed to save performance metric: {e}")
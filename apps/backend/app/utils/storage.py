@@ -1,10 +1,14 @@
-import json
 import os
 import re
-import base64
+import binascii
+import hashlib
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
+
+import ijson
+import orjson
 
 
 # base directory for storing dialogue data
@@ -12,6 +16,22 @@ DATA_DIR = Path("data")
 DIALOGUES_DIR = DATA_DIR / "dialogues"
 SCENES_DIR = DATA_DIR / "scenes"
 
+# Session and scene files are written pretty-printed, as with json.dump(indent=2)
+_JSON_DUMP_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+
+def _write_json_file(path: Path, data: Any) -> None:
+    """Write JSON to a temp file next to `path` and move it into place, so readers never see a partial file."""
+    # per-thread temp name, since session files are written from worker threads
+    tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(data, option=_JSON_DUMP_OPTIONS))
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
 
 def ensure_directories():
     """Ensure data directories exist."""
@@ -27,34 +47,46 @@ def get_session_images_dir(session_id: str) -> Path:
     return DIALOGUES_DIR / session_id / "images"
 
 
-def save_image_from_data_url(session_id: str, utterance_id: str, image_data_url: str) -> Optional[str]:
-    """Save an image from a data URL to a file. Returns the relative file path or None."""
+def session_image_path(session_id: str, image_ref: str) -> str:
+    """Path of a stored image relative to the dialogues directory, as kept in dialogue entries' image_path."""
+    return f"{session_id}/images/{image_ref}"
+
+
+def store_image_once(session_id: str, image_data_url: str) -> Optional[str]:
+    """Store an image under its content hash, writing it only if it is not already on disk.
+
+    Returns the image reference (file name within the session's images directory) or None.
+    """
     if not image_data_url or not image_data_url.startswith("data:image/"):
         return None
     
     try:
         # data URL: data:image/jpeg;base64,<data>
-        header, data = image_data_url.split(",", 1)
+        # Encoded once for hashing; the payload is decoded straight from a view of those
+        # bytes. binascii takes the view as is, where base64.b64decode would copy it first.
+        raw = image_data_url.encode()
+        comma = raw.index(b",")
+        header = image_data_url[:comma]
         # extract image format from header ("data:image/jpeg;base64" -> "jpeg")
         format_part = header.split("/")[1].split(";")[0] if "/" in header else "jpg"
         ext = format_part if format_part in ["jpeg", "jpg", "png", "gif", "webp"] else "jpg"
         
-        image_bytes = base64.b64decode(data)
+        image_hash = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        image_ref = f"{image_hash}.{ext}"
         
         images_dir = get_session_images_dir(session_id)
-        images_dir.mkdir(parents=True, exist_ok=True)
-        
-        image_filename = f"{utterance_id}.{ext}"
-        image_path = images_dir / image_filename
+        image_path = images_dir / image_ref
+        if image_path.exists():
+            return image_ref
         
+        images_dir.mkdir(parents=True, exist_ok=True)
         with open(image_path, "wb") as f:
-            f.write(image_bytes)
+            f.write(binascii.a2b_base64(memoryview(raw)[comma + 1:]))
         
-        # return relative path from dialogues directory
-        return f"{session_id}/images/{image_filename}"
+        return image_ref
     except Exception as e:
         # log errors but don't crash
-        print(f"Error saving image for utterance {utterance_id}: {e}")
+        print(f"Error saving image for session {session_id}: {e}")
         return None
 
 
@@ -69,17 +101,28 @@ def load_session_data(session_id: str) -> Optional[Dict[str, Any]]:
     session_file = get_session_file(session_id)
     if session_file.exists():
         try:
-            with open(session_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(session_file, "rb") as f:
+                return orjson.loads(f.read())
         except Exception:
             return None
     return None
 
 
+def iter_session_entries(session_id: str) -> Iterator[Dict[str, Any]]:
+    """Yield a session's dialogue entries one by one, parsing the file incrementally instead of loading it whole."""
+    session_file = get_session_file(session_id)
+    if not session_file.exists():
+        return
+    try:
+        with open(session_file, "rb") as f:
+            yield from ijson.items(f, "entries.item", use_float=True)
+    except (OSError, ijson.JSONError):
+        return
+
+
 def save_session_data(session_id: str, data: Dict[str, Any]) -> None:
     """Save/update session data to JSON file."""
     ensure_directories()
-    session_file = get_session_file(session_id)
     
     # load existing data if it exists
     existing_data = load_session_data(session_id) or {}
@@ -92,25 +135,36 @@ def save_session_data(session_id: str, data: Dict[str, Any]) -> None:
     if data.get("completed_at") or data.get("summary"):
         merged_data["completed_at"] = datetime.now().isoformat()
     
-    merged_data["session_id"] = session_id
-    
-    with open(session_file, "w", encoding="utf-8") as f:
-        json.dump(merged_data, f, indent=2, ensure_ascii=False)
+    _write_session_file(session_id, merged_data)
+
+
+def _write_session_file(session_id: str, data: Dict[str, Any]) -> None:
+    """Write a complete session document as is, without re-reading and merging the file."""
+    data["session_id"] = session_id
+    _write_json_file(get_session_file(session_id), data)
 
 
 def append_dialogue_entry(session_id: str, entry: Dict[str, Any]) -> None:
-    """Append a dialogue entry to the session. If entry contains image_data_url, save image separately."""
+    """Append a dialogue entry to the session. If entry contains image_data_url, store the image separately."""
+    append_dialogue_entries(session_id, [entry])
+
+
+def append_dialogue_entries(session_id: str, entries: List[Dict[str, Any]]) -> None:
+    """Append several dialogue entries to the session with a single read and write of the session file."""
     ensure_directories()
-    session_file = get_session_file(session_id)
     
-    # if entry has image_data_url, save image and replace with file path
-    if "image_data_url" in entry:
-        utterance_id = entry.get("utterance_id", f"img_{datetime.now().timestamp()}")
-        image_path = save_image_from_data_url(session_id, utterance_id, entry["image_data_url"])
-        if image_path:
-            entry["image_path"] = image_path
-        # remove the data URL from the entry
-        del entry["image_data_url"]
+    for entry in entries:
+        # if entry has image_data_url, store the image once and replace it with a reference
+        if "image_data_url" in entry:
+            image_ref = store_image_once(session_id, entry["image_data_url"])
+            if image_ref:
+                entry["image_ref"] = image_ref
+                entry["image_path"] = session_image_path(session_id, image_ref)
+            # remove the data URL from the entry
+            del entry["image_data_url"]
+        
+        if "timestamp" not in entry:
+            entry["timestamp"] = datetime.now().isoformat()
     
     # load existing session or create new
     session_data = load_session_data(session_id) or {
@@ -123,37 +177,75 @@ def append_dialogue_entry(session_id: str, entry: Dict[str, Any]) -> None:
     if "entries" not in session_data:
         session_data["entries"] = []
     
-    if "timestamp" not in entry:
-        entry["timestamp"] = datetime.now().isoformat()
+    session_entries = session_data["entries"]
+    for entry in entries:
+        session_entries.append(entry)
+        # track the newest system message so readers don't have to scan the dialogue
+        if entry.get("speaker") == "system" and entry.get("text"):
+            session_data["last_system_idx"] = len(session_entries) - 1
     
-    session_data["entries"].append(entry)
-    
-    save_session_data(session_id, session_data)
+    # session_data was just loaded in full, so it is written back directly rather than
+    # through save_session_data, which would read the file again to merge into it
+    session_data.setdefault("started_at", datetime.now().isoformat())
+    _write_session_file(session_id, session_data)
 
 
 # ===== Scene Storage Functions =====
 
+_UNSAFE_CHARS = re.compile(r'[^\w\s-]')
+_SEPARATOR_RUNS = re.compile(r'[\s-]+')
+
+
 def sanitize_scene_name(scene_name: str) -> str:
-    safe_name = re.sub(r'[^\w\s-]', '', scene_name.strip())
-    safe_name = re.sub(r'[\s-]+', '_', safe_name)
+    safe_name = _UNSAFE_CHARS.sub('', scene_name.strip())
+    safe_name = _SEPARATOR_RUNS.sub('_', safe_name)
     return safe_name.lower() or "default"
 
 
+# Maps each scene file's stem to the scene's display name, so listing scenes doesn't
+# have to parse every scene file. Sanitized names never start with ".", so it can't clash.
+SCENES_INDEX_FILE = SCENES_DIR / ".index.json"
+
+
+def _load_scenes_index() -> Dict[str, str]:
+    try:
+        with open(SCENES_INDEX_FILE, "rb") as f:
+            return orjson.loads(f.read())
+    except Exception:
+        return {}
+
+
 def get_scene_file(scene_name: str) -> Path:
     safe_name = sanitize_scene_name(scene_name)
     return SCENES_DIR / f"{safe_name}.json"
 
 
+# Parsed scene files by path, with the mtime they were read at; entries go stale on any write
+_scene_cache: Dict[Path, tuple[int, Dict[str, Any]]] = {}
+
+
 def load_scene(scene_name: str) -> Optional[Dict[str, Any]]:
+    """Load a scene, reusing the parsed file while it is unchanged on disk.
+    
+    Returns a shallow copy; callers must not modify the nested objects in place.
+    """
     ensure_scenes_directory()
     scene_file = get_scene_file(scene_name)
-    if scene_file.exists():
-        try:
-            with open(scene_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return None
-    return None
+    try:
+        mtime = scene_file.stat().st_mtime_ns
+    except OSError:
+        _scene_cache.pop(scene_file, None)
+        return None
+    cached = _scene_cache.get(scene_file)
+    if cached and cached[0] == mtime:
+        return dict(cached[1])
+    try:
+        with open(scene_file, "rb") as f:
+            scene_data = orjson.loads(f.read())
+    except Exception:
+        return None
+    _scene_cache[scene_file] = (mtime, scene_data)
+    return dict(scene_data)
 
 
 def save_scene_vocab(scene_name: str, objects: List[Dict[str, str]]) -> Dict[str, Any]:
@@ -167,7 +259,8 @@ def save_scene_vocab(scene_name: str, objects: List[Dict[str, str]]) -> Dict[str
     existing_scene = load_scene(scene_name)
     
     if existing_scene:
-        existing_objects = existing_scene.get("objects", [])
+        # copied, since the loaded list may be the cached one
+        existing_objects = list(existing_scene.get("objects", []))
     else:
         existing_objects = []
     
@@ -201,25 +294,44 @@ def save_scene_vocab(scene_name: str, objects: List[Dict[str, str]]) -> Dict[str
     
     # Save to file
     scene_file = get_scene_file(scene_name)
-    with open(scene_file, "w", encoding="utf-8") as f:
-        json.dump(scene_data, f, indent=2, ensure_ascii=False)
+    _write_json_file(scene_file, scene_data)
+    _scene_cache[scene_file] = (scene_file.stat().st_mtime_ns, dict(scene_data))
+    
+    index = _load_scenes_index()
+    if index.get(scene_file.stem) != scene_name:
+        index[scene_file.stem] = scene_name
+        _write_json_file(SCENES_INDEX_FILE, index)
     
     return scene_data
 
 
 def list_scenes() -> List[str]:
+    """List scene names from the scenes index, parsing only scene files the index doesn't know yet."""
     ensure_scenes_directory()
-    scenes = []
+    index = _load_scenes_index()
     
-    for file_path in SCENES_DIR.glob("*.json"):
+    stems = {
+        entry.name[:-len(".json")]
+        for entry in os.scandir(SCENES_DIR)
+        if entry.name.endswith(".json") and entry.path != str(SCENES_INDEX_FILE)
+    }
+    
+    # Files written before the index existed, or by something else
+    changed = False
+    for stem in stems - index.keys():
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                scene_name = data.get("scene", file_path.stem)
-                scenes.append(scene_name)
+            with open(SCENES_DIR / f"{stem}.json", "rb") as f:
+                data = orjson.loads(f.read())
+            index[stem] = data.get("scene", stem)
+            changed = True
         except Exception:
             # If we can't read the file, skip it
             continue
+    # Scene files that have since been removed
+    for stem in index.keys() - stems:
+        del index[stem]
+        changed = True
+    if changed:
+        _write_json_file(SCENES_INDEX_FILE, index)
     
-    return sorted(scenes)
-
+    return sorted(index.values())
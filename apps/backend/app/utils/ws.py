@@ -0,0 +1,11 @@
+"""WebSocket send helpers."""
+from fastapi import WebSocket
+import orjson
+
+
+async def send_json(ws: WebSocket, message: dict) -> None:
+    """Send a JSON message as a text frame, serialized with orjson instead of the stdlib encoder.
+
+    Kept as a text frame (not bytes) since binary frames carry streamed TTS audio.
+    """
+    await ws.send_text(orjson.dumps(message).decode())
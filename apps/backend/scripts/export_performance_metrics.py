@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 """Export performance metrics for reporting and analysis."""
 import asyncio
-import json
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
+import orjson
+
 # Add parent directory to path to import app modules
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -17,7 +18,8 @@ from app.db.models import PerformanceMetricDoc
 async def export_metrics(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    output_file: str = "performance_report.json"
+    output_file: str = "performance_report.json",
+    include_operations: bool = False
 ):
     """Export performance metrics aggregated by operation type."""
     await init_db()
@@ -32,52 +34,46 @@ async def export_metrics(
         else:
             query["timestamp"] = {"$lte": end_date}
     
-    # Fetch all metrics
-    metrics = await PerformanceMetricDoc.find(query).to_list()
+    # Per-type statistics are computed by Mongo, so only one row per operation type comes back
+    pipeline = [{"$group": {
+        "_id": "$operation_type",
+        "count": {"$sum": 1},
+        "total_ms": {"$sum": "$duration_ms"},
+        "min_ms": {"$min": "$duration_ms"},
+        "max_ms": {"$max": "$duration_ms"},
+        "avg_ms": {"$avg": "$duration_ms"},
+    }}]
+    by_operation = {
+        row.pop("_id"): row
+        async for row in PerformanceMetricDoc.find(query).aggregate(pipeline)
+    }
     
-    if not metrics:
+    if not by_operation:
         print("No metrics found for the specified date range.")
         return
+    exported = sum(stats["count"] for stats in by_operation.values())
     
-    # Aggregate by operation type
-    by_operation = {}
-    for metric in metrics:
-        op_type = metric.operation_type
-        if op_type not in by_operation:
-            by_operation[op_type] = {
-                "count": 0,
-                "total_ms": 0,
-                "min_ms": float('inf'),
-                "max_ms": 0,
-                "operations": []
-            }
-        
-        by_operation[op_type]["count"] += 1
-        by_operation[op_type]["total_ms"] += metric.duration_ms
-        by_operation[op_type]["min_ms"] = min(by_operation[op_type]["min_ms"], metric.duration_ms)
-        by_operation[op_type]["max_ms"] = max(by_operation[op_type]["max_ms"], metric.duration_ms)
-        by_operation[op_type]["operations"].append({
-            "operation_name": metric.operation_name,
-            "duration_ms": metric.duration_ms,
-            "timestamp": metric.timestamp.isoformat(),
-            "session_id": metric.session_id,
-            "username": metric.username,
-            "metadata": metric.metadata
-        })
-    
-    # Calculate averages and clean up min/max
-    for op_type in by_operation:
-        stats = by_operation[op_type]
-        stats["avg_ms"] = stats["total_ms"] / stats["count"]
-        if stats["min_ms"] == float('inf'):
-            stats["min_ms"] = 0
-    
-    # Export to JSON
     output_path = Path(output_file)
-    with open(output_path, "w") as f:
-        json.dump(by_operation, f, indent=2, default=str)
+    with open(output_path, "wb") as f:
+        f.write(orjson.dumps(by_operation, option=orjson.OPT_INDENT_2, default=str))
+    
+    if include_operations:
+        # Individual operations are streamed from the cursor straight to a JSON Lines file
+        operations_path = output_path.with_suffix(".operations.jsonl")
+        with open(operations_path, "wb") as ops_file:
+            async for metric in PerformanceMetricDoc.find(query):
+                ops_file.write(orjson.dumps({
+                    "operation_type": metric.operation_type,
+                    "operation_name": metric.operation_name,
+                    "duration_ms": metric.duration_ms,
+                    "timestamp": metric.timestamp.isoformat(),
+                    "session_id": metric.session_id,
+                    "username": metric.username,
+                    "metadata": metric.metadata
+                }, option=orjson.OPT_APPEND_NEWLINE, default=str))
+        print(f"Wrote individual operations to {operations_path}")
     
-    print(f"Exported {len(metrics)} metrics to {output_path}")
+    print(f"Exported {exported} metrics to {output_path}")
     print("\nSummary by operation type:")
     print("-" * 80)
     for op_type, stats in sorted(by_operation.items()):
@@ -111,6 +107,11 @@ async def main():
         default="performance_report.json",
         help="Output file path (default: performance_report.json)"
     )
+    parser.add_argument(
+        "--include-operations",
+        action="store_true",
+        help="Also write every individual operation to <output>.operations.jsonl"
+    )
     
     args = parser.parse_args()
     
@@ -132,7 +133,12 @@ async def main():
             print(f"Invalid end date format: {args.end_date}")
             sys.exit(1)
     
-    await export_metrics(start_date=start_date, end_date=end_date, output_file=args.output)
+    await export_metrics(
+        start_date=start_date,
+        end_date=end_date,
+        output_file=args.output,
+        include_operations=args.include_operations,
+    )
 
 
 if __name__ == "__main__":
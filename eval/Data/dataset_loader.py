@@ -1,30 +1,35 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any
-import json
+import os
+import pickle
+import sys
+import tempfile
+from typing import List, Dict, Any, Iterator, Tuple
+import ijson
 
 
 
 THIS_DIR = Path(__file__).resolve().parent
 ANNOTATIONS_DIR = THIS_DIR / "Action Object Dataset" / "Annotations"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SceneObject:
     object_id: str
-    labels_en: List[str]
+    labels_en: Tuple[str, ...]
     actionable: bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Scene:
     scene_id: str
     image_path: str              # path as stored in JSON
-    objects: List[SceneObject]
+    objects: Tuple[SceneObject, ...]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ActionExample:
     example_id: str
     scene_id: str
@@ -34,17 +39,53 @@ class ActionExample:
     prompt_en: str
     correct: bool
 
-def _load_json(filename: str) -> Any:
+def _iter_json_items(filename: str, prefix: str = "item") -> Iterator[Any]:
+    """Yield the entries of a top-level JSON array one at a time, without loading the whole file."""
     path = ANNOTATIONS_DIR / filename
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    with path.open("rb") as f:
+        yield from ijson.items(f, prefix, use_float=True)
 
 
-def load_scenes() -> List[Scene]:
-    raw = _load_json("scenes.json")
+def _cached_json_items(filename: str) -> List[Any]:
+    """
+    Entries of a top-level JSON array, reusing a pickle of the parsed entries kept
+    beside the annotations file as long as it is newer than the JSON; otherwise
+    re-parse and rewrite it. Only plain JSON data is pickled, so the dataclasses
+    are always built by the current code.
+    """
+    path = ANNOTATIONS_DIR / filename
+    cache_path = path.with_name(path.name + ".pkl")
+    try:
+        if cache_path.stat().st_mtime_ns > path.stat().st_mtime_ns:
+            with cache_path.open("rb") as f:
+                return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except (pickle.UnpicklingError, EOFError):
+        pass  # corrupt cache; rebuild below
+
+    items = list(_iter_json_items(filename))
+    tmp_path = None
+    try:
+        # Written to a temp file and moved into place, so a concurrent run never reads half a pickle
+        with tempfile.NamedTemporaryFile("wb", dir=cache_path.parent, prefix=cache_path.name + ".", suffix=".tmp", delete=False) as f:
+            tmp_path = Path(f.name)
+            pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # read-only checkout; just parse every run
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+    return items
+
+
+# The loaders are cached, so every caller shares one parsed copy of each file;
+# results are tuples and must not be mutated. Call clear_cache() to re-read.
+@lru_cache(maxsize=None)
+def load_scenes() -> Tuple[Scene, ...]:
     scenes: List[Scene] = []
 
-    for scene_entry in raw:
+    for scene_entry in _cached_json_items("scenes.json"):
         scene_id = scene_entry["scene_id"]
         image_path = scene_entry["image_path"]
         objects: List[SceneObject] = []
@@ -53,7 +94,8 @@ def load_scenes() -> List[Scene]:
             objects.append(
                 SceneObject(
                     object_id=obj["object_id"],
-                    labels_en=[lbl.lower() for lbl in obj.get("labels_en", [])],
+                    # Labels repeat heavily across scenes; interning shares one string per label
+                    labels_en=tuple(sys.intern(lbl.lower()) for lbl in obj.get("labels_en", [])),
                     actionable=bool(obj.get("actionable", False)),
                 )
             )
@@ -62,18 +104,18 @@ def load_scenes() -> List[Scene]:
             Scene(
                 scene_id=scene_id,
                 image_path=image_path,
-                objects=objects,
+                objects=tuple(objects),
             )
         )
 
-    return scenes
+    return tuple(scenes)
 
 
-def load_action_examples() -> List[ActionExample]:
-    raw = _load_json("actions.json")
+@lru_cache(maxsize=None)
+def load_action_examples() -> Tuple[ActionExample, ...]:
     actions: List[ActionExample] = []
 
-    for ex in raw:
+    for ex in _cached_json_items("actions.json"):
         actions.append(
             ActionExample(
                 example_id=ex["example_id"],
@@ -86,4 +128,10 @@ def load_action_examples() -> List[ActionExample]:
             )
         )
 
-    return actions
+    return tuple(actions)
+
+
+def clear_cache() -> None:
+    """Drop the cached datasets so the next load re-reads the annotation files."""
+    load_scenes.cache_clear()
+    load_action_examples.cache_clear()
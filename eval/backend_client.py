@@ -0,0 +1,15 @@
+import httpx
+
+
+def make_client(max_in_flight: int) -> httpx.AsyncClient:
+    """
+    Shared AsyncClient for the eval scripts: one keep-alive pool sized to the
+    requests a script allows in flight, reused for the whole run.
+    The backend is plain-HTTP uvicorn (HTTP/1.1 only), so HTTP/2 is not enabled.
+    """
+    limits = httpx.Limits(
+        max_connections=max_in_flight,
+        max_keepalive_connections=max_in_flight,
+        keepalive_expiry=60.0,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60.0, connect=5.0))
@@ -1,118 +1,224 @@
-import json, asyncio, os, time
+import argparse, asyncio, os, time
 from pathlib import Path
-import httpx
+import ijson
+import orjson
 import jiwer  # for WER/CER
 
+from backend_client import make_client
+
 DATA_ROOT = Path("Data/Voice_Transcription_Dataset")
+CONCURRENCY = 8  # transcription requests in flight at once
+READ_AHEAD = 8  # audio files read ahead of the requests in flight
+SCORE_CHUNK = 64  # samples scored and written per batch
+SCORE_CACHE_MAX = 100_000  # distinct (gold, pred) pairs whose scores are kept for reuse
 
-def save_results(results: dict, prefix: str = "asr_eval_results"):
+def results_path(prefix: str = "asr_eval_results") -> Path:
+    """Timestamped summary path for a new run; its samples go next to it with a .jsonl suffix."""
     ts = time.strftime("%Y%m%d_%H%M%S")
-    out_path = f"{prefix}_{ts}.json"
-    with open(out_path, "w") as f:
-        json.dump(results, f, indent=2)
+    return Path(f"{prefix}_{ts}.json")
+
+
+def save_results(results: dict, out_path: Path):
+    with open(out_path, "wb") as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
     print(f"[saved] Results written to {out_path}")
 
 
-async def transcribe(client, audio_path, language=None):
-    with open(audio_path, "rb") as f:
-        files = {"file": (audio_path.name, f, "audio/wav")}
-        data = {}
-        if language:
-            data["language"] = language
-        resp = await client.post("http://localhost:8000/transcribe", files=files, data=data)
+async def transcribe(client, filename, audio_bytes, language=None):
+    files = {"file": (filename, audio_bytes, "audio/wav")}
+    data = {}
+    if language:
+        data["language"] = language
+    resp = await client.post("http://localhost:8000/transcribe", files=files, data=data)
     if resp.status_code != 200:
         return None, resp.status_code
-    return resp.json().get("text", ""), resp.status_code
-
-
-
-async def main():
+    return orjson.loads(resp.content).get("text", ""), resp.status_code
+
+
+
+def _language_code(lang_raw: str) -> str | None:
+    lang_raw = lang_raw.lower()
+    if lang_raw in ("english", "en"):
+        return "en"
+    if lang_raw in ("spanish", "es"):
+        return "es"
+    return None
+
+
+async def run_one(client, sem, read_ahead, sample, subject_audio_dir):
+    """Transcribe one sample; returns (sample_record, None) or (None, http_error)."""
+    sample_id = sample["sample_id"]
+    gold = sample["transcription"].strip().lower()
+
+    audio_file = subject_audio_dir / f"{sample_id}.wav"
+    if not audio_file.exists():
+        print(f"[WARN] Missing audio file for {sample_id}")
+        return None, {
+            "sample_id": sample_id,
+            "error": "missing_audio",
+            "audio_path": str(audio_file)
+        }
+
+    lang = _language_code(sample.get("language", ""))
+
+    # Read the next files off the event loop while earlier requests are still in flight;
+    # read_ahead bounds how many files are held in memory at once
+    async with read_ahead:
+        audio_bytes = await asyncio.to_thread(audio_file.read_bytes)
+        async with sem:
+            pred, status = await transcribe(client, audio_file.name, audio_bytes, language=lang)
+
+    if pred is None:
+        print(f"[ERROR] {sample_id}: HTTP {status}")
+        return None, {
+            "sample_id": sample_id,
+            "error": f"http_{status}",
+            "audio_path": str(audio_file)
+        }
+
+    return {
+        "sample_id": sample_id,
+        "audio_path": str(audio_file),
+        "gold": gold,
+        "predicted": pred.strip().lower(),
+    }, None
+
+
+def _pair_error_rates(output) -> list[float]:
+    """Per-pair error rate from a batched jiwer output, matching jiwer.wer/cer on each pair alone."""
+    rates = []
+    for reference, chunks in zip(output.references, output.alignments):
+        errors = 0
+        for chunk in chunks:
+            if chunk.type == "insert":
+                errors += chunk.hyp_end_idx - chunk.hyp_start_idx
+            elif chunk.type != "equal":
+                errors += chunk.ref_end_idx - chunk.ref_start_idx
+        rates.append(errors / len(reference))
+    return rates
+
+
+def _score_pairs(pairs: list[tuple[str, str]], cache: dict) -> list[tuple[float, float]]:
+    """(WER, CER) per (gold, pred) pair; only pairs not already in cache go to jiwer, once each."""
+    new_pairs = [pair for pair in dict.fromkeys(pairs) if pair not in cache]
+    scored = {}
+    if new_pairs:
+        golds = [g for g, _ in new_pairs]
+        preds = [p for _, p in new_pairs]
+        wers = _pair_error_rates(jiwer.process_words(golds, preds))
+        cers = _pair_error_rates(jiwer.process_characters(golds, preds))
+        scored = dict(zip(new_pairs, zip(wers, cers)))
+        for pair, scores in scored.items():
+            if len(cache) < SCORE_CACHE_MAX:
+                cache[pair] = scores
+    return [cache.get(pair) or scored[pair] for pair in pairs]
+
+
+def _load_scored_samples(path: Path) -> tuple[set, int, float, float, int]:
+    """Read a previous run's samples file; returns (sample_ids, count, wer_sum, cer_sum, mismatches)."""
+    done, wer_sum, cer_sum, mismatches = set(), 0.0, 0.0, 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            done.add(record["sample_id"])
+            wer_sum += record["wer"]
+            cer_sum += record["cer"]
+            mismatches += record["predicted"] != record["gold"]
+    return done, len(done), wer_sum, cer_sum, mismatches
+
+
+async def main(args: argparse.Namespace):
     annotations_path = DATA_ROOT / "Annotations/annotations.json"
-    with open(annotations_path, "r") as f:
-        annotations = json.load(f)
 
-    total_samples = 0
-    wer_scores = []
-    cer_scores = []
+    # One scored sample per line, appended as the run goes. A resumed run keeps
+    # appending to the given file and rewrites the summary next to it.
+    done: set = set()
+    total_samples, wer_sum, cer_sum, mismatches = 0, 0.0, 0.0, 0
+    if args.resume:
+        samples_path = args.resume
+        out_path = samples_path.with_suffix(".json")
+        if samples_path.exists():
+            done, total_samples, wer_sum, cer_sum, mismatches = _load_scored_samples(samples_path)
+        print(f"[resume] {total_samples} samples already scored in {samples_path}")
+    else:
+        out_path = results_path()
+        samples_path = out_path.with_suffix(".jsonl")
 
-    all_samples: list[dict] = []
-    error_examples: list[dict] = []
     http_errors: list[dict] = []
 
-    async with httpx.AsyncClient() as client:
-        for subject in annotations:
-            subject_audio_dir = Path(subject["audio_path"])
-
-            for sample in subject["samples"]:
-                sample_id = sample["sample_id"]
-                gold = sample["transcription"].strip().lower()
-
-                audio_file = subject_audio_dir / f"{sample_id}.wav"
-                if not audio_file.exists():
-                    print(f"[WARN] Missing audio file for {sample_id}")
-                    http_errors.append({
-                        "sample_id": sample_id,
-                        "error": "missing_audio",
-                        "audio_path": str(audio_file)
-                    })
-                    continue
-
-                lang_raw = sample.get("language", "").lower()
-                if lang_raw in ("english", "en"):
-                    lang = "en"
-                elif lang_raw in ("spanish", "es"):
-                    lang = "es"
-                else:
-                    lang = None 
-
-                pred, status = await transcribe(client, audio_file, language=lang)
-
-                if pred is None:
-                    print(f"[ERROR] {sample_id}: HTTP {status}")
-                    http_errors.append({
-                        "sample_id": sample_id,
-                        "error": f"http_{status}",
-                        "audio_path": str(audio_file)
-                    })
+    # Requests run concurrently, at most CONCURRENCY in flight. Samples are scored in
+    # batched jiwer calls and appended to samples_path as they finish, so a crashed run
+    # keeps its progress and can be continued with --resume
+    sem = asyncio.Semaphore(CONCURRENCY)
+    read_ahead = asyncio.Semaphore(CONCURRENCY + READ_AHEAD)
+    async with make_client(CONCURRENCY) as client:
+        # Subjects are parsed one at a time rather than loading the whole annotations file
+        with open(annotations_path, "rb") as f:
+            tasks = [
+                run_one(client, sem, read_ahead, sample, Path(subject["audio_path"]))
+                for subject in ijson.items(f, "item", use_float=True)
+                for sample in subject["samples"]
+                if sample["sample_id"] not in done
+            ]
+
+        with open(samples_path, "ab") as out:
+            pending: list[dict] = []
+            score_cache: dict[tuple[str, str], tuple[float, float]] = {}
+
+            def write_scored(chunk: list[dict]):
+                nonlocal total_samples, wer_sum, cer_sum, mismatches
+                # WER and CER for the chunk's distinct unseen pairs in one batched jiwer call each;
+                # short utterances repeat a lot, so most pairs come from the cache
+                scores = _score_pairs([(r["gold"], r["predicted"]) for r in chunk], score_cache)
+                lines = []
+                for sample_record, (wer, cer) in zip(chunk, scores):
+                    sample_record["wer"] = wer
+                    sample_record["cer"] = cer
+                    total_samples += 1
+                    wer_sum += wer
+                    cer_sum += cer
+                    mismatches += sample_record["predicted"] != sample_record["gold"]
+                    out.write(orjson.dumps(sample_record) + b"\n")
+                    lines.append(f"{sample_record['sample_id']}: gold='{sample_record['gold']}', pred='{sample_record['predicted']}', "
+                                 f"WER={wer:.3f}, CER={cer:.3f}")
+                out.flush()
+                # One write per chunk rather than a print per sample
+                print("\n".join(lines), flush=True)
+
+            for next_result in asyncio.as_completed(tasks):
+                sample_record, http_error = await next_result
+                if http_error is not None:
+                    http_errors.append(http_error)
                     continue
-
-                pred = pred.strip().lower()
-
-                wer = jiwer.wer(gold, pred)
-                cer = jiwer.cer(gold, pred)
-
-                wer_scores.append(wer)
-                cer_scores.append(cer)
-                total_samples += 1
-
-                sample_record = {
-                    "sample_id": sample_id,
-                    "audio_path": str(audio_file),
-                    "gold": gold,
-                    "predicted": pred,
-                    "wer": wer,
-                    "cer": cer,
-                }
-                all_samples.append(sample_record)
-
-                if pred != gold:
-                    error_examples.append(sample_record)
-
-                print(f"{sample_id}: gold='{gold}', pred='{pred}', WER={wer:.3f}, CER={cer:.3f}")
+                pending.append(sample_record)
+                if len(pending) >= SCORE_CHUNK:
+                    write_scored(pending)
+                    pending = []
+            if pending:
+                write_scored(pending)
 
     summary = {
         "total_samples": total_samples,
-        "mean_WER": sum(wer_scores) / len(wer_scores) if wer_scores else None,
-        "mean_CER": sum(cer_scores) / len(cer_scores) if cer_scores else None,
+        "mean_WER": wer_sum / total_samples if total_samples else None,
+        "mean_CER": cer_sum / total_samples if total_samples else None,
+        "mismatched_samples": mismatches,
+        "samples_path": str(samples_path),
         "http_errors": http_errors,
-        "all_samples": all_samples,
-        "errors": error_examples,
     }
 
     print("\n===== ASR EVALUATION SUMMARY =====")
-    print(json.dumps(summary, indent=2))
-    save_results(summary)
+    print(orjson.dumps(summary, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode())
+    save_results(summary, out_path)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Evaluate /transcribe against the voice transcription dataset.")
+    parser.add_argument(
+        "--resume",
+        type=Path,
+        metavar="SAMPLES_JSONL",
+        help="Continue an earlier run: skip the samples already scored in its .jsonl file and append to it.",
+    )
+    asyncio.run(main(parser.parse_args()))
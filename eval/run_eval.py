@@ -1,14 +1,18 @@
 import argparse
 import asyncio
-import json
+import dataclasses
+from functools import lru_cache
 import os
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 import time
 import httpx
+import orjson
 import random
+import sys
 
 from Data import dataset_loader
+from backend_client import make_client
 
 # Backend URL for FastAPI app
 DEFAULT_BACKEND = os.getenv("EVAL_BACKEND_URL", "http://localhost:8000")
@@ -18,43 +22,166 @@ EVAL_ROOT = Path(__file__).resolve().parent
 REPO_ROOT = EVAL_ROOT.parent
 DATA_ROOT = EVAL_ROOT / "Data"
 
-# Limit concurrency to avoid overloading the backend
+# Limit concurrency to avoid overloading the backend (default for --concurrency)
 REQUEST_LIMIT = 2
-semaphore = asyncio.Semaphore(REQUEST_LIMIT)
 
-def save_results(results: dict, prefix: str = "eval_results"):
+# Attempts per /v1/chat request; 5xx responses and connection errors/timeouts are retried
+CHAT_TRIES = 3
+
+# Consecutive failed requests (after retries) before the run is aborted as a broken backend
+MAX_CONSECUTIVE_FAILURES = 20
+_consecutive_failures = 0
+
+# Most items /v1/chat_batch accepts per call (the backend's MAX_BATCH_ITEMS)
+CHAT_BATCH_MAX = 32
+
+# Print full error response bodies (--verbose); otherwise only their size
+VERBOSE = False
+
+# Error examples kept in the results JSON; every error is streamed to the errors JSONL
+MAX_ERROR_EXAMPLES = 10
+
+def save_results(encoded: bytes, prefix: str = "eval_results") -> str:
+    """Write already-encoded results JSON to a timestamped file; returns its path."""
     ts = time.strftime("%Y%m%d_%H%M%S")
     out_path = f"{prefix}_{ts}.json"
-    with open(out_path, "w") as f:
-        json.dump(results, f, indent=2)
-    print(f"[saved] Results written to {out_path}")
+    with open(out_path, "wb") as f:
+        f.write(encoded)
+    return out_path
+
+@lru_cache(maxsize=None)
+def resolve_eval_path(rel: str) -> Path:
+    """Absolute path of a dataset file; cached since the same images recur across examples."""
+    return (EVAL_ROOT / rel).resolve()
+
+
+def error_body(resp: httpx.Response) -> str:
+    """Error response body for console messages; decoded only with --verbose."""
+    if VERBOSE:
+        return resp.text
+    return f"<{len(resp.content)} bytes; --verbose to show>"
+
+
+def write_jsonl(f, record: Dict[str, Any]):
+    f.write(orjson.dumps(record) + b"\n")
+
+
+async def call_chat(
+    client: httpx.AsyncClient,
+    payload: Dict[str, Any],
+    path: str = "/v1/chat",
+) -> httpx.Response:
+    # Encoded with orjson rather than httpx's stdlib json= encoding
+    resp = await client.post(
+        f"{DEFAULT_BACKEND}{path}",
+        content=orjson.dumps(payload),
+        headers={"content-type": "application/json"},
+    )
+    return resp
 
-def safe_get_attr(obj: Any, *names: str) -> Any:
+
+class BackendUnhealthyError(Exception):
+    """Raised once MAX_CONSECUTIVE_FAILURES requests in a row have failed; main aborts the run."""
+
+
+def raise_if_backend_unhealthy():
+    if _consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+        raise BackendUnhealthyError(
+            f"Backend unhealthy: {_consecutive_failures} consecutive /v1/chat failures; aborting run"
+        )
+
+
+def record_chat_outcome(failed: bool, items: int = 1):
+    """Abort the run once MAX_CONSECUTIVE_FAILURES requests in a row have failed; `items` counts a failed batch per item."""
+    global _consecutive_failures
+    _consecutive_failures = _consecutive_failures + items if failed else 0
+    raise_if_backend_unhealthy()
+
+
+async def call_chat_limited(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    payload: Dict[str, Any],
+    path: str = "/v1/chat",
+    items: int = 1,
+) -> Tuple[httpx.Response | None, Exception | None]:
     """
-    Try multiple attribute / key names on obj.
-    Returns first non-None value, or None if nothing works.
+    call_chat under the run's concurrency limit; returns (response, None) or (None, error).
+    Transient failures are retried with jittered backoff, so they don't count as misses.
+    `items` is how many scenes/examples the payload carries, for the failure count.
     """
-    for name in names:
-        # dataclass or simple object
-        if hasattr(obj, name):
-            val = getattr(obj, name)
-            if val is not None:
-                return val
-        # dict-like
-        if isinstance(obj, dict) and name in obj and obj[name] is not None:
-            return obj[name]
-    return None
-
-
-async def call_chat(client: httpx.AsyncClient, payload: Dict[str, Any]) -> httpx.Response:
-    resp = await client.post(f"{DEFAULT_BACKEND}/v1/chat", json=payload, timeout=60.0)
-    return resp
+    resp, error = None, None
+    for attempt in range(CHAT_TRIES):
+        if attempt:
+            # Back off outside the semaphore so other requests keep the slots busy
+            await asyncio.sleep(0.25 * 2 ** (attempt - 1) + random.random() * 0.1)
+        async with sem:
+            # Requests still queued when the breaker trips fail without reaching the backend
+            raise_if_backend_unhealthy()
+            try:
+                resp, error = await call_chat(client, payload, path), None
+            except httpx.TransportError as e:
+                resp, error = None, e
+            except Exception as e:
+                resp, error = None, e
+                break
+        if error is None and resp.status_code < 500:
+            break
+    # 4xx is a problem with this item, not the backend, so it doesn't trip the breaker
+    record_chat_outcome(error is not None or resp.status_code >= 500, items)
+    return resp, error
+
+
+async def call_chat_batch_limited(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    payloads: List[Dict[str, Any]],
+) -> List[Tuple[httpx.Response | None, Exception | None]]:
+    """
+    Send payloads in one /v1/chat_batch call and unpack one (response, error) per
+    payload, shaped as if each had been sent to /v1/chat on its own.
+    """
+    resp, error = await call_chat_limited(client, sem, {"items": payloads}, "/v1/chat_batch", len(payloads))
+    if error is not None or resp.status_code != 200:
+        # The whole batch failed, so every item reports that failure
+        return [(resp, error)] * len(payloads)
+    outcomes = []
+    for r in orjson.loads(resp.content)["results"]:
+        record_chat_outcome(r["status_code"] >= 500)
+        outcomes.append((httpx.Response(r["status_code"], content=orjson.dumps(r["body"])), None))
+    return outcomes
+
+
+async def chat_outcomes(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    payloads: List[Dict[str, Any]],
+    batch_size: int,
+) -> List[Tuple[httpx.Response | None, Exception | None]]:
+    """
+    One (response, error) per payload, in order; batch_size > 1 groups them through /v1/chat_batch.
+    Requests run in a TaskGroup, so a BackendUnhealthyError cancels the ones still pending.
+    """
+    async with asyncio.TaskGroup() as tg:
+        if batch_size <= 1:
+            tasks = [tg.create_task(call_chat_limited(client, sem, p)) for p in payloads]
+        else:
+            tasks = [
+                tg.create_task(call_chat_batch_limited(client, sem, payloads[i:i + batch_size]))
+                for i in range(0, len(payloads), batch_size)
+            ]
+    if batch_size <= 1:
+        return [t.result() for t in tasks]
+    return [outcome for t in tasks for outcome in t.result()]
 
 
 async def evaluate_scene_objects(
     client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    errors_out,
     scenes: List[Any],
     max_scenes: int | None = None,
+    batch_size: int = 1,
 ) -> Dict[str, Any]:
     """
     Evaluate 'scene_objects' task:
@@ -68,28 +195,38 @@ async def evaluate_scene_objects(
     num_scenes = len(scenes)
     exact_match_count = 0
 
-    per_scene_errors: List[Dict[str, Any]] = []
+    num_errors = 0
+    example_errors: List[Dict[str, Any]] = []
+
+    def record_error(error: Dict[str, Any]):
+        nonlocal num_errors
+        num_errors += 1
+        write_jsonl(errors_out, {"task": "scene_objects", **error})
+        if len(example_errors) < MAX_ERROR_EXAMPLES:
+            example_errors.append(error)
+
+    prepared: List[Tuple[str, set[str], Dict[str, str], Dict[str, Any]]] = []
 
     for scene in scenes:
-        scene_id = safe_get_attr(scene, "scene_id") or "<unknown_scene>"
-        image_rel = safe_get_attr(scene, "image_path")
+        scene_id = scene.scene_id or "<unknown_scene>"
+        image_rel = scene.image_path
         if not image_rel:
             print(f"[scene_objects] WARNING: scene {scene_id} missing image_path; skipping")
             continue
 
-        scene_image_path = (EVAL_ROOT / image_rel).resolve()
+        scene_image_path = resolve_eval_path(image_rel)
 
         # Build ground-truth canonical labels + alias mapping
         actionable_objs = [
-            obj for obj in getattr(scene, "objects", [])
-            if getattr(obj, "actionable", False)
+            obj for obj in scene.objects
+            if obj.actionable
         ]
 
         alias_to_canonical: Dict[str, str] = {}
         canonical_set: set[str] = set()
 
         for obj in actionable_objs:
-            labels = getattr(obj, "labels_en", []) or []
+            labels = obj.labels_en
             if not labels:
                 continue
             canonical = labels[0].strip().lower()
@@ -102,39 +239,44 @@ async def evaluate_scene_objects(
             "scene_id": scene_id,
             "scene_image_path": str(scene_image_path),
         }
+        prepared.append((scene_id, canonical_set, alias_to_canonical, payload))
 
-        try:
-            resp = await call_chat(client, payload)
-        except Exception as e:
+    # Requests run concurrently under sem; results are scored in scene order below
+    outcomes = await chat_outcomes(client, sem, [p[-1] for p in prepared], batch_size)
+
+    for (scene_id, canonical_set, alias_to_canonical, _), (resp, e) in zip(prepared, outcomes):
+        if e is not None:
             print(f"[scene_objects] ERROR for {scene_id}: {e}")
             # All ground-truth are missed
             fn += len(canonical_set)
-            per_scene_errors.append({
+            gt_sorted = sorted(canonical_set)  # every ground-truth object is also missing
+            record_error({
                 "scene_id": scene_id,
                 "error": f"request_failed: {e}",
-                "gt_actionable": sorted(list(canonical_set)),
+                "gt_actionable": gt_sorted,
                 "predicted": [],
                 "matched": [],
                 "extra": [],
-                "missing": sorted(list(canonical_set)),
+                "missing": gt_sorted,
             })
             continue
 
         if resp.status_code != 200:
-            print(f"[scene_objects] ERROR for {scene_id}: HTTP {resp.status_code}: {resp.text}")
+            print(f"[scene_objects] ERROR for {scene_id}: HTTP {resp.status_code}: {error_body(resp)}")
             fn += len(canonical_set)
-            per_scene_errors.append({
+            gt_sorted = sorted(canonical_set)  # every ground-truth object is also missing
+            record_error({
                 "scene_id": scene_id,
                 "error": f"http_{resp.status_code}",
-                "gt_actionable": sorted(list(canonical_set)),
+                "gt_actionable": gt_sorted,
                 "predicted": [],
                 "matched": [],
                 "extra": [],
-                "missing": sorted(list(canonical_set)),
+                "missing": gt_sorted,
             })
             continue
 
-        data = resp.json()
+        data = orjson.loads(resp.content)
         predicted_raw: List[str] = []
 
         if isinstance(data, dict):
@@ -156,39 +298,36 @@ async def evaluate_scene_objects(
                     elif isinstance(obj, str):
                         predicted_raw.append(obj)
 
-        matched_canonical: set[str] = set()
-        extras: List[str] = []
-
-        for lbl in predicted_raw:
-            norm = lbl.strip().lower()
-            canonical = alias_to_canonical.get(norm)
-            if not canonical:
-                # predicted something that is not a known actionable label → FP
-                fp += 1
-                extras.append(lbl)
-                continue
-
-            if canonical not in matched_canonical:
-                matched_canonical.add(canonical)
-                tp += 1
-            else:
-                # duplicate prediction counts as another FP
-                fp += 1
-                extras.append(lbl + " (duplicate)")
+        # Each distinct matched object is a TP; unknown labels and repeats are FPs
+        canonicals = [alias_to_canonical.get(lbl.strip().lower()) for lbl in predicted_raw]
+        matched_canonical = {c for c in canonicals if c}
+        scene_fp = len(canonicals) - len(matched_canonical)
+        tp += len(matched_canonical)
+        fp += scene_fp
 
         missing = canonical_set - matched_canonical
         fn += len(missing)
 
-        if not extras and not missing:
+        if not scene_fp and not missing:
             exact_match_count += 1
         else:
-            per_scene_errors.append({
+            # Only scenes with errors need the FP labels spelled out, in prediction order
+            extras: List[str] = []
+            seen: set[str] = set()
+            for lbl, canonical in zip(predicted_raw, canonicals):
+                if not canonical:
+                    extras.append(lbl)
+                elif canonical in seen:
+                    extras.append(lbl + " (duplicate)")
+                else:
+                    seen.add(canonical)
+            record_error({
                 "scene_id": scene_id,
-                "gt_actionable": sorted(list(canonical_set)),
+                "gt_actionable": sorted(canonical_set),
                 "predicted": predicted_raw,
-                "matched": sorted(list(matched_canonical)),
+                "matched": sorted(matched_canonical),
                 "extra": extras,
-                "missing": sorted(list(missing)),
+                "missing": sorted(missing),
             })
 
     precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
@@ -200,9 +339,6 @@ async def evaluate_scene_objects(
     )
     scene_exact = exact_match_count / num_scenes if num_scenes > 0 else 0.0
 
-    # Limit error examples a bit so JSON isn't gigantic
-    example_errors = per_scene_errors[:10]
-
     return {
         "precision": precision,
         "recall": recall,
@@ -212,22 +348,25 @@ async def evaluate_scene_objects(
         "fn": fn,
         "scene_exact_match": scene_exact,
         "num_scenes": num_scenes,
+        "num_errors": num_errors,
         "example_errors": example_errors,
-        "all_errors": per_scene_errors
     }
 
 
 async def evaluate_action_judgment(
     client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    errors_out,
     scenes: List[Any],
     max_examples: int | None = None,
+    batch_size: int = 1,
 ) -> Dict[str, Any]:
     """
     Evaluate 'action_judgment' task:
     - Each example: (scene_image, action_image, prompt_en, correct label True/False).
     - The model says predicted_correct True/False.
     """
-    scene_by_id = {safe_get_attr(s, "scene_id"): s for s in scenes}
+    scene_by_id = {s.scene_id: s for s in scenes}
     examples = dataset_loader.load_action_examples()
     # ---- Create negative (scrambled) examples ----
     negative_examples = []
@@ -238,19 +377,17 @@ async def evaluate_action_judgment(
         while wrong_ex.scene_id == ex.scene_id and wrong_ex.action_image_path == ex.action_image_path:
             wrong_ex = random.choice(examples)
 
-        neg = {
-            "example_id": ex.example_id + "_neg",
-            "scene_id": ex.scene_id,
-            "scene_image":ex.scene_image_path,       # original scene
-            "action_image": wrong_ex.action_image_path,  # mismatched
-            "target_object_id": ex.target_object_id,
-            "prompt_en": ex.prompt_en,
-            "correct": False,  # negative label
-        }
+        # Same dataclass as the positives, so the loop below reads every example the same way
+        neg = dataclasses.replace(
+            ex,
+            example_id=ex.example_id + "_neg",
+            action_image_path=wrong_ex.action_image_path,  # mismatched; scene stays the original
+            correct=False,  # negative label
+        )
         negative_examples.append(neg)
 
     # Merge positives + negatives
-    examples = examples + negative_examples
+    examples = [*examples, *negative_examples]
 
     if max_examples is not None:
         examples = examples[:max_examples]
@@ -260,19 +397,18 @@ async def evaluate_action_judgment(
 
     fp_examples: List[Dict[str, Any]] = []
     fn_examples: List[Dict[str, Any]] = []
+    prepared: List[Tuple[str, Path, Path, str, bool, Dict[str, Any]]] = []
 
     for ex in examples:
-        example_id = safe_get_attr(ex, "example_id") or "<unknown_example>"
-        scene_id = safe_get_attr(ex, "scene_id")
+        example_id = ex.example_id or "<unknown_example>"
+        scene_id = ex.scene_id
 
-        # Try multiple possible field names → fixes the NoneType crash
-        scene_image_rel = safe_get_attr(ex, "scene_image", "scene_image_path")
-        action_image_rel = safe_get_attr(ex, "action_image", "action_image_path")
+        scene_image_rel = ex.scene_image_path
+        action_image_rel = ex.action_image_path
 
         # Fallback: infer scene image from scenes.json if missing
-        if not scene_image_rel and scene_id and scene_id in scene_by_id:
-            scene = scene_by_id[scene_id]
-            scene_image_rel = safe_get_attr(scene, "image_path")
+        if not scene_image_rel and scene_id and (scene := scene_by_id.get(scene_id)) is not None:
+            scene_image_rel = scene.image_path
 
         if not scene_image_rel or not action_image_rel:
             print(
@@ -281,11 +417,11 @@ async def evaluate_action_judgment(
             skipped += 1
             continue
 
-        scene_image = (EVAL_ROOT / scene_image_rel).resolve()
-        action_image = (EVAL_ROOT / action_image_rel).resolve()
+        scene_image = resolve_eval_path(scene_image_rel)
+        action_image = resolve_eval_path(action_image_rel)
 
-        prompt_en = safe_get_attr(ex, "prompt_en") or ""
-        gt_correct = bool(safe_get_attr(ex, "correct"))
+        prompt_en = ex.prompt_en or ""
+        gt_correct = ex.correct
 
         payload = {
             "task": "action_judgment",
@@ -294,10 +430,13 @@ async def evaluate_action_judgment(
             "action_image_path": str(action_image),
             "prompt_en": prompt_en,
         }
+        prepared.append((example_id, scene_image, action_image, prompt_en, gt_correct, payload))
 
-        try:
-            resp = await call_chat(client, payload)
-        except Exception as e:
+    # Requests run concurrently under sem; results are scored in example order below
+    outcomes = await chat_outcomes(client, sem, [p[-1] for p in prepared], batch_size)
+
+    for (example_id, scene_image, action_image, prompt_en, gt_correct, _), (resp, e) in zip(prepared, outcomes):
+        if e is not None:
             print(f"[action_judgment] ERROR for {example_id}: {e}")
             skipped += 1
             continue
@@ -305,12 +444,12 @@ async def evaluate_action_judgment(
         if resp.status_code != 200:
             print(
                 f"[action_judgment] ERROR for {example_id}: "
-                f"HTTP {resp.status_code}: {resp.text}"
+                f"HTTP {resp.status_code}: {error_body(resp)}"
             )
             skipped += 1
             continue
 
-        data = resp.json()
+        data = orjson.loads(resp.content)
         if not isinstance(data, dict) or "predicted_correct" not in data:
             print(f"[action_judgment] ERROR for {example_id}: missing predicted_correct")
             skipped += 1
@@ -323,30 +462,30 @@ async def evaluate_action_judgment(
             tp += 1
         elif gt_correct and not pred_correct:
             fn += 1
-            if len(fn_examples) < 10:
-                fn_examples.append(
-                    {
-                        "example_id": example_id,
-                        "scene_image": str(scene_image),
-                        "action_image": str(action_image),
-                        "prompt_en": prompt_en,
-                        "ground_truth_correct": gt_correct,
-                        "predicted_correct": pred_correct,
-                    }
-                )
+            error = {
+                "example_id": example_id,
+                "scene_image": str(scene_image),
+                "action_image": str(action_image),
+                "prompt_en": prompt_en,
+                "ground_truth_correct": gt_correct,
+                "predicted_correct": pred_correct,
+            }
+            write_jsonl(errors_out, {"task": "action_judgment", "kind": "false_negative", **error})
+            if len(fn_examples) < MAX_ERROR_EXAMPLES:
+                fn_examples.append(error)
         elif (not gt_correct) and pred_correct:
             fp += 1
-            if len(fp_examples) < 10:
-                fp_examples.append(
-                    {
-                        "example_id": example_id,
-                        "scene_image": str(scene_image),
-                        "action_image": str(action_image),
-                        "prompt_en": prompt_en,
-                        "ground_truth_correct": gt_correct,
-                        "predicted_correct": pred_correct,
-                    }
-                )
+            error = {
+                "example_id": example_id,
+                "scene_image": str(scene_image),
+                "action_image": str(action_image),
+                "prompt_en": prompt_en,
+                "ground_truth_correct": gt_correct,
+                "predicted_correct": pred_correct,
+            }
+            write_jsonl(errors_out, {"task": "action_judgment", "kind": "false_positive", **error})
+            if len(fp_examples) < MAX_ERROR_EXAMPLES:
+                fp_examples.append(error)
         else:
             tn += 1
 
@@ -375,46 +514,65 @@ async def evaluate_action_judgment(
             "false_positives": fp_examples,
             "false_negatives": fn_examples,
         },
-        "all_false_positives": fp_examples,
-        "all_false_negatives": fn_examples,
     }
 
 
 async def main(args: argparse.Namespace):
-    async with httpx.AsyncClient() as client:
-        scenes = dataset_loader.load_scenes()
-
-        scene_metrics = await evaluate_scene_objects(
-            client,
-            scenes,
-            max_scenes=args.max_scenes,
-        )
-
-        action_metrics = await evaluate_action_judgment(
-            client,
-            scenes,
-            max_examples=args.max_actions,
-        )
-
-    # Combine final results
+    sem = asyncio.Semaphore(args.concurrency)
+    # Every error is appended here as it is scored, so nothing is held for the final dump
+    errors_path = f"eval_errors_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"
+    with open(errors_path, "wb") as errors_out:
+        async with make_client(args.concurrency) as client:
+            scenes = dataset_loader.load_scenes()
+
+            # Both tasks share sem, so together they stay within --concurrency. A tripped
+            # breaker cancels everything still in flight and ends the run
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    scene_task = tg.create_task(evaluate_scene_objects(
+                        client,
+                        sem,
+                        errors_out,
+                        scenes,
+                        max_scenes=args.max_scenes,
+                        batch_size=args.batch_size,
+                    ))
+                    action_task = tg.create_task(evaluate_action_judgment(
+                        client,
+                        sem,
+                        errors_out,
+                        scenes,
+                        max_examples=args.max_actions,
+                        batch_size=args.batch_size,
+                    ))
+            except* BackendUnhealthyError as eg:
+                abort = eg
+            else:
+                abort = None
+    if abort is not None:
+        # The errors streamed so far are kept; report the first breaker error and fail the run
+        while isinstance(abort, BaseExceptionGroup):
+            abort = abort.exceptions[0]
+        print(f"[abort] {abort} (errors so far in {errors_path})", file=sys.stderr)
+        sys.exit(1)
+    scene_metrics, action_metrics = scene_task.result(), action_task.result()
+
+    # Combine final results; the full error lists are in errors_path
     final_results = {
         "backend": DEFAULT_BACKEND,
         "scene_objects": scene_metrics,
         "action_judgment": action_metrics,
-
-        "scene_errors": scene_metrics.get("all_errors", []),
-        "action_errors": {
-            "false_positives": action_metrics.get("all_false_positives", []),
-            "false_negatives": action_metrics.get("all_false_negatives", []),
-        },
+        "errors_path": errors_path,
     }
 
 
-    # Print to console
-    print(json.dumps(final_results, indent=2))
-
-    # Save to timestamped JSON file
-    save_results(final_results)
+    # Encode once for both the console and the timestamped JSON file; the file is
+    # written on a worker thread while the console dump runs
+    encoded = orjson.dumps(final_results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    save_task = asyncio.create_task(asyncio.to_thread(save_results, encoded))
+    print(encoded.decode())
+    out_path = await save_task
+    print(f"[saved] Results written to {out_path}")
 
 
 
@@ -433,5 +591,28 @@ if __name__ == "__main__":
         default=None,
         help="Limit number of action examples evaluated (default: all)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=REQUEST_LIMIT,
+        help=f"Max /v1/chat requests in flight at once (default: {REQUEST_LIMIT})",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help=(
+            "Scenes/examples sent per /v1/chat_batch call; 1 sends each to /v1/chat "
+            f"(default: 1, max: {CHAT_BATCH_MAX})"
+        ),
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print full response bodies for HTTP errors (default: just their size)",
+    )
     args = parser.parse_args()
+    VERBOSE = args.verbose
+    if not 1 <= args.batch_size <= CHAT_BATCH_MAX:
+        parser.error(f"--batch_size must be between 1 and {CHAT_BATCH_MAX}")
     asyncio.run(main(args))